@@ -0,0 +1,266 @@
+import argparse
+import gc
+import importlib.util
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import collisions
+import instrumentation
+import patternMatching
+import random2
+
+def makeText(filename, size, seed = 0): #writes size random letters from A to Z to filename
+	rng = random.Random(seed)
+	table = bytes(65 + i%26 for i in range(256)) #maps a random byte to a letter, close enough to uniform
+	with open(filename, 'wb') as f:
+		left = size
+		while left > 0:
+			n = min(left, 1 << 20)
+			f.write(rng.randbytes(n).translate(table))
+			left -= n
+
+def timed(function, *args): #returns (seconds taken, value returned)
+	start = time.perf_counter()
+	value = function(*args)
+	return time.perf_counter() - start, value
+
+def benchmarkMmap(filename, m = 16, eps = 0.01, puresize = 1 << 24):
+	#compares the pure-Python rolling hash with the numpy backend on the same file and the same prime
+	size = os.path.getsize(filename)
+	with open(filename) as f:
+		f.seek(size//2)
+		p = f.read(m) #a pattern that occurs at least once
+	q = patternMatching.randPrime(min(patternMatching.findN(eps, m), patternMatching.MAXNUMPYPRIME))
+
+	#the pure-Python path is only timed on a prefix, its throughput does not depend on the length of the text
+	with open(filename) as f:
+		prefix = f.read(min(size, puresize))
+	puretime, pure = timed(patternMatching.modPatternMatch, q, p, prefix)
+	mmaptime, found = timed(patternMatching.modPatternMatchMmap, q, p, filename)
+	assert [i for i in found if i <= len(prefix) - m] == pure #same offsets on the common prefix
+
+	purerate = len(prefix)/puretime
+	mmaprate = size/mmaptime
+	print("pure python: %.2f MB/s on %d bytes" % (purerate/1e6, len(prefix)))
+	print("numpy mmap:  %.2f MB/s on %d bytes (%d matches)" % (mmaprate/1e6, size, len(found)))
+	print("speedup:     %.1fx" % (mmaprate/purerate))
+
+def makeBodies(n, seed = 0): #n bodies one unit apart with random masses and velocities, lots of collisions early on
+	rng = random.Random(seed)
+	M = [rng.uniform(1, 10) for i in range(n)]
+	x = [float(i) for i in range(n)]
+	v = [rng.uniform(-1, 1) for i in range(n)]
+	return M, x, v
+
+def loadModule(path): #imports another version of a module, e.g. collisions.py from an older checkout
+	spec = importlib.util.spec_from_file_location(os.path.splitext(os.path.basename(path))[0] + "_baseline", path)
+	module = importlib.util.module_from_spec(spec)
+	spec.loader.exec_module(module)
+	return module
+
+HORIZON = 1e12 #T for the collision runs, far below 2**53 so that T and T+1 are still different floats for every version of collisions.py
+
+def eventRate(module, M, x, v, events): #(seconds to build the heap, events per second) of listCollisions in module
+	buildtime, result = timed(module.listCollisions, list(M), list(x), list(v), 0, HORIZON)
+	totaltime, result = timed(module.listCollisions, list(M), list(x), list(v), events, HORIZON)
+	return buildtime, len(result)/max(totaltime - buildtime, 1e-9)
+
+def benchmarkCollisions(n = 10**6, events = 200000, against = None):
+	#events per second of the collision simulation on n bodies, compared with another collisions.py if against is given
+	M, x, v = makeBodies(n)
+	buildtime, rate = eventRate(collisions, M, x, v, events)
+	print("collisions:  build %.2f s, %.0f events/s on %d bodies" % (buildtime, rate, n))
+	if against is not None:
+		basebuild, baserate = eventRate(loadModule(against), M, x, v, events)
+		print("baseline:    build %.2f s, %.0f events/s" % (basebuild, baserate))
+		print("speedup:     %.1fx events/s" % (rate/baserate))
+
+def makeTextPattern(size, m = 16, seed = 0): #size random letters from A to Z and a pattern of length m taken from the middle
+	rng = random.Random(seed)
+	table = bytes(65 + i%26 for i in range(256))
+	text = rng.randbytes(size).translate(table).decode('ascii')
+	middle = max(0, (size - m)//2)
+	return text, text[middle:middle + m]
+
+def makeRandomGraph(n, edges, seed = 0): #edges links between random pairs of n nodes with random capacities
+	rng = random.Random(seed)
+	return [(rng.randrange(n), rng.randrange(n), rng.randint(1, 10**6)) for i in range(edges)]
+
+def makeGridGraph(side, seed = 0): #side x side grid, every node linked to its right and lower neighbour, random capacities
+	rng = random.Random(seed)
+	links = []
+	for r in range(side):
+		for c in range(side):
+			u = r*side + c
+			if c + 1 < side:
+				links.append((u, u + 1, rng.randint(1, 10**6)))
+			if r + 1 < side:
+				links.append((u, u + side, rng.randint(1, 10**6)))
+	return links
+
+def bestTime(function, args, repeat = 5, minimum = 0.2):
+	#timeit-style (best seconds per call, value of the last call): the number of calls per sample doubles until a sample takes minimum seconds
+	#that calibration doubles as the warm-up, then the best of repeat more samples is kept, with the garbage collector off as in timeit
+	enabled = gc.isenabled()
+	gc.disable()
+	try:
+		return sampleTimes(function, args, repeat, minimum)
+	finally:
+		if enabled:
+			gc.enable()
+
+def sampleTimes(function, args, repeat, minimum): #Helper function, the loop of bestTime
+	number = 1
+	while True:
+		start = time.perf_counter()
+		for i in range(number):
+			value = function(*args)
+		seconds = (time.perf_counter() - start)/number
+		if seconds*number >= minimum:
+			break
+		number *= 2
+	for r in range(repeat):
+		start = time.perf_counter()
+		for i in range(number):
+			value = function(*args)
+		seconds = min(seconds, (time.perf_counter() - start)/number)
+	return seconds, value
+
+#every workload turns a size and a seed into (function, arguments, units of work, seconds spent building the input or None)
+#None units means one per item returned
+def textWorkload(size, seed):
+	text, p = makeTextPattern(size, seed = seed)
+	q = patternMatching.randPrime(patternMatching.findN(0.01, len(p))) #picked outside the timing
+	return patternMatching.modPatternMatch, (q, p, text), size, None
+
+def graphWorkload(size, seed): #size links, 8 links per node on average
+	#findMaxCapacities sweeps the whole graph, findMaxCapacity would stop wherever the target happens to be
+	n = max(2, size//8)
+	build, graph = bestTime(random2.Graph.fromLinks, (n, makeRandomGraph(n, size, seed)), 1)
+	return random2.findMaxCapacities, (n, graph, 0), size, build
+
+def gridWorkload(size, seed): #about size links
+	side = max(2, math.isqrt(size//2))
+	links = makeGridGraph(side, seed)
+	build, graph = bestTime(random2.Graph.fromLinks, (side*side, links), 1)
+	return random2.findMaxCapacities, (side*side, graph, 0), len(links), build
+
+def collisionsWorkload(size, seed): #size bodies and at most size collisions
+	M, x, v = makeBodies(size, seed)
+	return collisions.listCollisions, (M, x, v, size, HORIZON), None, None
+
+WORKLOADS = { #name -> (workload, unit of throughput)
+	"text": (textWorkload, "chars"),
+	"graph": (graphWorkload, "edges"),
+	"grid": (gridWorkload, "edges"),
+	"collisions": (collisionsWorkload, "events"),
+}
+
+def measure(name, size, seed = 0, memory = True, repeat = 5): #best of repeated runs of a workload, the peak memory comes from a separate run because tracemalloc slows everything down
+	workload, unit = WORKLOADS[name]
+	function, args, work, build = workload(size, seed)
+	seconds, value = bestTime(function, args, repeat)
+	if work is None:
+		work = len(value)
+	peak = None
+	if memory:
+		tracemalloc.start()
+		function(*args)
+		peak = tracemalloc.get_traced_memory()[1] #bytes allocated by the call on top of its inputs
+		tracemalloc.stop()
+	return {"size": size, "seconds": seconds, "rate": work/max(seconds, 1e-9), "peak": peak, "build": build}
+
+def fitExponent(sizes, seconds): #least squares slope of log(seconds) against log(size), time grows like size**exponent
+	if len(sizes) < 2:
+		return None
+	xs = [math.log(s) for s in sizes]
+	ys = [math.log(max(t, 1e-9)) for t in seconds]
+	mx, my = sum(xs)/len(xs), sum(ys)/len(ys)
+	return sum((a - mx)*(b - my) for a, b in zip(xs, ys))/sum((a - mx)**2 for a in xs)
+
+def runSuite(names, sizes, seed = 0, memory = True, repeat = 5): #{name: {"unit", "runs", "exponent"}}, printed as it goes
+	results = {}
+	for name in names:
+		unit = WORKLOADS[name][1]
+		runs = []
+		for size in sizes:
+			run = measure(name, size, seed, memory, repeat)
+			runs.append(run)
+			peak = "" if run["peak"] is None else ", peak %.1f MB" % (run["peak"]/1e6)
+			build = "" if run["build"] is None else ", build %.3f s" % run["build"]
+			print("%-11s n=%-9d %8.3f s, %12.0f %s/s%s%s" % (name, size, run["seconds"], run["rate"], unit, peak, build))
+		exponent = fitExponent([run["size"] for run in runs], [run["seconds"] for run in runs])
+		if exponent is not None:
+			print("%-11s scaling exponent %.2f" % (name, exponent))
+		results[name] = {"unit": unit, "runs": runs, "exponent": exponent}
+	return results
+
+def compareBaseline(results, baseline, tolerance = 0.8): #prints throughput against a saved run, returns the (name, size) pairs slower than tolerance times the baseline
+	regressions = []
+	for name, result in results.items():
+		old = {run["size"]: run for run in baseline.get(name, {}).get("runs", [])}
+		for run in result["runs"]:
+			if run["size"] not in old:
+				continue
+			ratio = run["rate"]/old[run["size"]]["rate"]
+			flag = ""
+			if ratio < tolerance:
+				regressions.append((name, run["size"]))
+				flag = "  REGRESSION"
+			print("%-11s n=%-9d %.2fx baseline throughput%s" % (name, run["size"], ratio, flag))
+	return regressions
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser()
+	commands = parser.add_subparsers(dest="command", required=True)
+	mmap = commands.add_parser("mmap", help="pure Python against numpy rolling hash on a text file")
+	mmap.add_argument("--file", default=os.path.join(tempfile.gettempdir(), "bench_text.txt"))
+	mmap.add_argument("--size", type=int, default=1 << 30) #1 GB
+	mmap.add_argument("--m", type=int, default=16)
+	heap = commands.add_parser("collisions", help="event rate of listCollisions")
+	heap.add_argument("--n", type=int, default=10**6)
+	heap.add_argument("--events", type=int, default=200000)
+	heap.add_argument("--against", help="path of another collisions.py to compare with")
+	scaling = commands.add_parser("suite", help="throughput, peak memory and scaling of every workload over a range of sizes")
+	scaling.add_argument("--workloads", nargs="+", choices=sorted(WORKLOADS), default=sorted(WORKLOADS))
+	scaling.add_argument("--min-size", type=int, default=10**3)
+	scaling.add_argument("--max-size", type=int, default=10**5) #up to 10**7, the pure Python workloads take minutes there
+	scaling.add_argument("--seed", type=int, default=0)
+	scaling.add_argument("--repeat", type=int, default=5, help="timed samples per size after the warm-up, the best one is kept")
+	scaling.add_argument("--no-memory", action="store_true", help="skip the traced run for peak memory")
+	scaling.add_argument("--save", help="write the results to this JSON file as a baseline")
+	scaling.add_argument("--compare", help="JSON baseline of an earlier run to compare with")
+	scaling.add_argument("--stats", action="store_true", help="run with instrumentation on and print what it recorded")
+	scaling.add_argument("--tolerance", type=float, default=0.8, help="throughput below this fraction of the baseline is a regression")
+	args = parser.parse_args()
+	if args.command == "mmap":
+		if not os.path.exists(args.file) or os.path.getsize(args.file) != args.size:
+			makeText(args.file, args.size)
+		benchmarkMmap(args.file, args.m)
+	elif args.command == "collisions":
+		benchmarkCollisions(args.n, args.events, args.against)
+	else:
+		sizes = []
+		size = args.min_size
+		while size <= args.max_size: #powers of ten from min-size
+			sizes.append(size)
+			size *= 10
+		if args.stats:
+			instrumentation.enable()
+		results = runSuite(args.workloads, sizes, args.seed, not args.no_memory, args.repeat)
+		if args.stats:
+			print(json.dumps(instrumentation.disable().snapshot(), indent=1))
+		if args.save:
+			with open(args.save, 'w') as f:
+				json.dump(results, f, indent=1)
+		if args.compare:
+			with open(args.compare) as f:
+				baseline = json.load(f)
+			if compareBaseline(results, baseline, args.tolerance):
+				sys.exit(1)
@@ -1,121 +1,129 @@
+import math
+import pickle
+from array import array
+from bisect import bisect_right
+
+import instrumentation
+
+try:
+	import numpy as np
+except ImportError: #numpy is only needed for listCollisionsEnsemble
+	np = None
+
 class Heap:
 	#I will be using the min-heap to store values from 1 to n-1 where n is the number of objects
 	#The heap invariant is maintained using the time of collisions between the i and i+1th object
+	#ties between equal times are broken in favour of the lower numbered block
+	#struct, positions and times are flat arrays of machine ints and doubles instead of lists of boxed numbers
+	__slots__ = ('struct', 'times', 'positions', 'size')
 
 	def __init__(self, n, M, x, v, T):#intializing the min-heap object
-		self.struct = [i for i in range(n-1)] #array representation of the heap
-		self.times = [0 for i in range(n-1)] #array containing times corresponding to collisions of the ith and i+1th collision
-		for i in range(n-1):
-			self.times[i] = collision_time(0,i,M,x,v,T) #
-		self.positions = [i for i in range(n-1)] #index of the ith block in the heap structure
+		self.struct = array('l', range(n-1)) #array representation of the heap
+		self.times = array('d', [collision_time(0,i,M,x,v,T) for i in range(n-1)]) #array containing times corresponding to collisions of the ith and i+1th collision
+		self.positions = array('l', range(n-1)) #index of the ith block in the heap structure
 		self.size = n-1 #size of our heap
 		#O(n)
 
-	def parent(self, i): #calculates the position of the parent for the given index
-		return max(0, (i-1)//2)
-		#O(1)
-
-	def left(self, i): #calculates the position of the left child for the given index
-		return min(2*i+1, self.size-1)
-		#O(1)
-
-	def right(self, i): #calculates the position of the right child for the given index
-		return min(2*i+2, self.size-1)
-		#O(1)
-
-	def heap_up(self, k): #This is the standard heap up operation
-		p = self.parent(k) #parent index of the kth index
-		pp = self.struct[p]
-		kk = self.struct[k]
-
-		#condition for swapping the element with its parent, when time of parent is less or the number of the parent block is greater with the same time
-		if (self.times[pp] == self.times[kk] and kk < pp) or (self.times[pp] > self.times[kk]):
-			self.positions[kk], self.positions[pp] = p, k
-			self.struct[k], self.struct[p] = pp, kk
-			self.heap_up(p) #recurse on the parent
+	def heap_up(self, k): #This is the standard heap up operation, done with a loop instead of recursion
+		struct = self.struct
+		positions = self.positions
+		times = self.times
+		start = k
+		kk = struct[k]
+		time = times[kk]
+		while k > 0:
+			p = (k-1) >> 1 #parent index of the kth index
+			pp = struct[p]
+			#stop once the parent has the smaller time, or the same time and the smaller number
+			if times[pp] < time or (times[pp] == time and pp < kk):
+				break
+			struct[k] = pp #the parent moves down, kk is only written once at its final place
+			positions[pp] = k
+			k = p
+		struct[k] = kk
+		positions[kk] = k
+		if instrumentation.stats is not None:
+			instrumentation.stats.add("collisions.heap.ops")
+			instrumentation.stats.add("collisions.heap.swaps", (start+1).bit_length() - (k+1).bit_length()) #levels moved
 		#O(logn)
 
-	def heap_down(self, k):#This is the standard heap down operation
-		l = self.left(k) #left child index of the kth index
-		r = self.right(k) #right child indez of the kth index
-
-		kk = self.struct[k]
-
-		mini = r
-		if self.times[self.struct[l]] == self.times[self.struct[r]]:
-			mini = self.positions[min(self.struct[l],self.struct[r])]
-		elif self.times[self.struct[l]] < self.times[self.struct[r]]:
-			mini = l
-		#mini is the child with the smaller collision time
-		minimini = self.struct[mini]
-
-		#condition for swapping the element with its smaller time child, when smaller time of children is less or the number of the smaller time child block is lesser with the same time
-		if (self.times[minimini] == self.times[kk] and minimini < kk) or (self.times[minimini] < self.times[kk]):
-			self.positions[kk], self.positions[minimini] = mini, k
-			self.struct[k], self.struct[mini] = minimini, kk
-			self.heap_down(mini) #recurse on the child with the smaller time
+	def heap_down(self, k):#This is the standard heap down operation, done with a loop instead of recursion
+		struct = self.struct
+		positions = self.positions
+		times = self.times
+		size = self.size
+		start = k
+		kk = struct[k]
+		time = times[kk]
+		while True:
+			l = 2*k + 1 #left child index of the kth index
+			if l >= size:
+				break
+			mini = l #the child with the smaller time, or the smaller number for equal times
+			minimini = struct[l]
+			r = l + 1 #right child index of the kth index
+			if r < size:
+				rr = struct[r]
+				if times[rr] < times[minimini] or (times[rr] == times[minimini] and rr < minimini):
+					mini = r
+					minimini = rr
+			if times[minimini] > time or (times[minimini] == time and minimini > kk):
+				break
+			struct[k] = minimini #the smaller child moves up
+			positions[minimini] = k
+			k = mini
+		struct[k] = kk
+		positions[kk] = k
+		if instrumentation.stats is not None:
+			instrumentation.stats.add("collisions.heap.ops")
+			instrumentation.stats.add("collisions.heap.swaps", (k+1).bit_length() - (start+1).bit_length())
 		#O(logn)
 
 	def build(self): #this is the standard linear time build heap operation
-		for i in range(self.size-1,-1,-1): #heap down from the last element
+		for i in range(self.size//2-1,-1,-1): #heap down from the last element that has a child
 			self.heap_down(i) 
 		#O(n)
 
-	def view_min_time(self): #returns the number of the block at the top of the heap
+	def view_min_time(self): #returns the time corresponding to the block at the top of the heap
 		return self.times[self.struct[0]]
 		#O(1)
 
-	def view_min_i(self): #returns the time corresponding to the block at the top of the heap
+	def view_min_i(self): #returns the number of the block at the top of the heap
 		return self.struct[0]
 		#O(1)
 
-	def extract_min(self): #Slightly different extract_min
-		#When this function is called, the ith and i+1th objects have collided
-		#so their velocitie have changed, and hence the time of their next collisions as well
-		#this function is more of a repairing operation to satisfy the min-heap property again
-
-		top = self.struct[0]
-		self.heap_down(0)
-
-		mini = top - 1
-		maxi = top + 1
-
-		#The root object has collided hence the time of next collision changed
-		#Heap down to get it to a new position that satisfies the min-heap property
-
-		#Since the time of collisions for the i-1 and i+1th object changed
-		#we heap_up both of them to bring them to their correct locations
-
-		if mini > 0 and maxi <= self.size - 1:
-			if self.times[top-1] > self.times[top+1]:
-				mini = top+1
-				maxi = top-1
-
-		#mini is the i-1th object
-		#maxi is the i+1th object
-
-		if mini >= 0:
-			self.heap_up(self.positions[mini]) #bring mini to its correct position in the heap
-		if maxi <= self.size-1:
-			self.heap_up(self.positions[maxi]) #bring maxi to its correct position in the heap
-
+	def change(self, i, time): #sets the collision time of the ith block and moves it to its correct location in the heap
+		old = self.times[i]
+		self.times[i] = time
+		if time < old:
+			self.heap_up(self.positions[i])
+		elif time > old:
+			self.heap_down(self.positions[i])
 		#O(logn)
 
 	def update(self,t, k, M, x, v, T): #updates the collision times of the k-1, k, k+1th object with the next objects after the kth block has collided
-		self.times[k] = collision_time(t,k, M, x, v, T)
-		if k != 0:
-			self.times[k-1] = collision_time(t,k-1, M,x,v,T)
-		if k != self.size-1:
-			self.times[k+1] = collision_time(t,k+1, M,x,v,T)
-		#O(1)
+		#When this function is called, the kth and k+1th objects have collided
+		#so their velocities have changed, and hence the time of their next collisions as well
+		#each of the three times is put back in its place before the next one is changed,
+		#changing all three first and then repairing can leave one of them above a smaller time
+		for i in range(max(k-1, 0), min(k+2, self.size)):
+			#same computation as collision_time, written out here to save three calls per collision
+			if v[i] <= v[i+1]:
+				time = math.inf
+			else:
+				time = t + (x[i+1]+v[i+1]*t-x[i]-v[i]*t)/(v[i]-v[i+1])
+				if time > T:
+					time = math.inf
+			self.change(i, time)
+		#O(logn)
 
 def collision_time(t, k, M, x, v, T): #calculates the collision time between the k and k+1th object
 	if v[k] <= v[k+1]:
-		return T + 1 #when collision is not possible, set the time as T
+		return math.inf #when collision is not possible, set the time as infinity, T+1 would equal T for T above 2**53
 	else:
 		time = t + (x[k+1]+v[k+1]*t-x[k]-v[k]*t)/(v[k]-v[k+1])
 		if time > T:
-			time = T+1 #if time exceeds the maximum time T, set it as T+1
+			time = math.inf #if time exceeds the maximum time T, set it as infinity too
 		return time
 	#O(1)
 
@@ -123,40 +131,171 @@ def velocities(m,v,x,i): #calculates the velocity after elastic collision of the
 	return (((m[i] - m[i+1])/(m[i+1] + m[i]))*v[i] + ((2*m[i+1])/(m[i+1] + m[i]))*(v[i+1]),((m[i] - m[i+1])/(m[i+1] + m[i]))*(-v[i+1]) + ((2*m[i])/(m[i+1] + m[i]))*v[i])
 	#O(1)
 
-def listCollisions(M,x,v,m,T):
-	if len(M) <= 1: #case of no collisions
-		return []
+class CollisionSimulator:
+	#the simulation of listCollisions as an iterator, every next() processes one collision and returns it
+	#the simulator works on its own copies of x and v, so the lists of the caller are never changed
+	#the whole state (heap, substitute positions, velocities, current time, number of collisions) can be saved with save and resumed with load
+	#with history=True every collision is also logged per body, so stateAt can give the state at any earlier time without replaying
+
+	def __init__(self, M, x, v, m, T, history = False):
+		self.M = list(M)
+		self.x0 = list(x) if history else None #starting positions and velocities, the state of a body before its first collision
+		self.v0 = list(v) if history else None
+		self.history = {} if history else None #body -> (times, substitute positions, velocities) after each of its collisions
+		self.x = list(x) #substitute positions, see __next__
+		self.v = list(v)
+		self.m = m #maximum number of collisions
+		self.T = T #maximum time
+		self.current_time = 0
+		self.number = 0 #number of collisions so far
+		self.minheap = None
+		if len(M) > 1: #otherwise there are no collisions
+			self.minheap = Heap(len(M), self.M, self.x, self.v, T) #Our heap is called minheap
+			self.minheap.build() #build the heap
+		#O(n)
 
-	minheap = Heap(len(M), M,x,v,T) #Our heap is called minheap
-	minheap.build() #build the heap
-	current_time = 0
-	number = 0 #number of collisions
-	result = []
+	def __iter__(self):
+		return self
 
-	while True:
+	def __next__(self):
+		minheap = self.minheap
+		if minheap is None or self.number >= self.m:
+			raise StopIteration
 		mintime = minheap.view_min_time() #mintime is the the minimum time of collision in the heap
-		if mintime <= T and number < m: #runs provided the number of collisions is less than m and time hasn't exceeded T
-			least_time = minheap.view_min_i() #number of block at the top of the heap
-			current_time = mintime #minimum time of collision in the heap
-			point_of_collision = x[least_time] + v[least_time]*current_time #calculates the coordinate of collision
-			vel = velocities(M,v,x,least_time) #calculating velocities after collision
-			x[least_time] = x[least_time] + current_time*(v[least_time]-vel[0]) #updating coordinate of the collided object
-			x[least_time+1] = x[least_time+1] + current_time*(v[least_time+1]-vel[1]) #updating coordinate of the collided object
-			#This is the most important step which reduces the time complexity of the algorithm from O(n+mnlogn) to O(m+nlogn)
-			#We DO NOT update the location of every block after each collision
-			#instead we calculate an equivalent distance for the blocks that have collided
-			#this is not their actual position but a substitute that will give us the correct position of the block when needed
-			#we only need the position of the block when comparing times of collisions
-			#we calculate position by the initial position plus velocity*time elapsed
-			#but since we update velocities it is not possible to apply the above formula directly
-			#so instead we calculate the substitute position for which this formula can directly be applied
-
-			v[least_time], v[least_time + 1] = vel[0], vel[1] #updating velocities in the list of velocities
-			minheap.update(current_time, least_time, M,x,v,T) #updating the times in the heap
-			minheap.extract_min() #maintaining the min-heap property after updating the coordinates, velocities and times
-			result += [(round(current_time, 4), round(least_time, 4), round(point_of_collision,4))] #push to the result list which has to be returned
-			number += 1
-		else:
-			break #come out of the loop when time exceeds T or number of collisions reaches m
-	return result
-	#Overall complexity O(n+mlogn)
\ No newline at end of file
+		if mintime > self.T: #stops when time exceeds T or number of collisions reaches m
+			raise StopIteration
+		M, x, v = self.M, self.x, self.v
+		least_time = minheap.view_min_i() #number of block at the top of the heap
+		current_time = mintime #minimum time of collision in the heap
+		point_of_collision = x[least_time] + v[least_time]*current_time #calculates the coordinate of collision
+		vel = velocities(M,v,x,least_time) #calculating velocities after collision
+		x[least_time] = x[least_time] + current_time*(v[least_time]-vel[0]) #updating coordinate of the collided object
+		x[least_time+1] = x[least_time+1] + current_time*(v[least_time+1]-vel[1]) #updating coordinate of the collided object
+		#This is the most important step which reduces the time complexity of the algorithm from O(n+mnlogn) to O(m+nlogn)
+		#We DO NOT update the location of every block after each collision
+		#instead we calculate an equivalent distance for the blocks that have collided
+		#this is not their actual position but a substitute that will give us the correct position of the block when needed
+		#we only need the position of the block when comparing times of collisions
+		#we calculate position by the initial position plus velocity*time elapsed
+		#but since we update velocities it is not possible to apply the above formula directly
+		#so instead we calculate the substitute position for which this formula can directly be applied
+
+		v[least_time], v[least_time + 1] = vel[0], vel[1] #updating velocities in the list of velocities
+		if self.history is not None:
+			self.log(least_time, current_time)
+			self.log(least_time + 1, current_time)
+		minheap.update(current_time, least_time, M,x,v,self.T) #updating the times in the heap, which also maintains the min-heap property
+		self.current_time = current_time
+		self.number += 1
+		if instrumentation.stats is not None:
+			instrumentation.stats.tick("collisions.events")
+		return (round(current_time, 4), round(least_time, 4), round(point_of_collision,4))
+		#O(logn)
+
+	def log(self, i, time): #appends the state of the ith block after a collision at time to its event log
+		entry = self.history.get(i)
+		if entry is None:
+			entry = self.history[i] = (array('d'), array('d'), array('d'))
+		entry[0].append(time)
+		entry[1].append(self.x[i])
+		entry[2].append(self.v[i])
+		#O(1)
+
+	def horizon(self): #the state is known exactly up to this time, the next collision or T
+		if self.minheap is None:
+			return self.T
+		return min(self.minheap.view_min_time(), self.T)
+
+	def stateAt(self, t, lo = 0, hi = None): #(positions, velocities) of blocks lo to hi-1 at time t, collisions at exactly t count as done
+		if self.history is None:
+			raise ValueError("stateAt needs a simulator made with history=True")
+		if hi is None:
+			hi = len(self.M)
+		if t < 0 or t > self.horizon():
+			raise ValueError("time %r is outside the simulated range [0, %r]" % (t, self.horizon()))
+		positions = []
+		velocities = []
+		for i in range(lo, hi):
+			x, v = self.x0[i], self.v0[i]
+			entry = self.history.get(i)
+			if entry is not None:
+				j = bisect_right(entry[0], t) #number of collisions of the ith block up to time t
+				if j:
+					x, v = entry[1][j-1], entry[2][j-1]
+			positions.append(x + v*t) #substitute position, see __next__
+			velocities.append(v)
+		return positions, velocities
+		#O((hi-lo)log(collisions per block))
+
+	def save(self, filename): #checkpoint of the whole state, the run continues from here after load
+		with open(filename, 'wb') as f:
+			pickle.dump(self, f)
+
+	@staticmethod
+	def load(filename):
+		with open(filename, 'rb') as f:
+			return pickle.load(f)
+
+def iterCollisions(M,x,v,m,T): #yields the collisions of listCollisions one by one as they happen
+	return CollisionSimulator(M,x,v,m,T)
+
+def listCollisions(M,x,v,m,T):
+	return list(CollisionSimulator(M,x,v,m,T))
+	#Overall complexity O(n+mlogn)
+
+def ensembleTimes(t, rows, i, x, v, T): #collision_time for the ith and i+1th blocks of the given systems, t, rows and i are per system
+	xi, xj, vi, vj = x[rows, i], x[rows, i+1], v[rows, i], v[rows, i+1]
+	with np.errstate(divide='ignore', invalid='ignore'): #the quotient is thrown away wherever vi <= vj
+		time = t + (xj + vj*t - xi - vi*t)/(vi - vj) #same order of operations as collision_time so the floats are identical
+	return np.where((vi <= vj) | (time > T), np.inf, time)
+	#O(len(i))
+
+def listCollisionsEnsemble(M, x, v, m, T):
+	#runs listCollisions on every row of the (batch, n) arrays M, x and v, all systems take one collision per step in lock-step
+	#returns flat columns (system, time, block, point) ordered by system and then by collision, rounded like listCollisions
+	#the times of each system are kept in a plain (batch, n-1) array, the first smallest time is the lowest numbered block as in Heap
+	if np is None:
+		raise ImportError("listCollisionsEnsemble requires numpy")
+	M = np.array(M, dtype=np.float64, ndmin=2)
+	x = np.array(x, dtype=np.float64, ndmin=2) #copies, substitute positions as in CollisionSimulator
+	v = np.array(v, dtype=np.float64, ndmin=2)
+	batch, n = M.shape
+	records = []
+	if n > 1:
+		times = np.full((batch, n-1), np.inf)
+		everything = np.arange(batch)
+		for i in range(n-1):
+			times[:, i] = ensembleTimes(0, everything, np.full(batch, i), x, v, T)
+		count = np.zeros(batch, dtype=np.int64) #collisions so far in every system
+		live = np.arange(batch) #systems that may still have a collision
+		while len(live):
+			k = times[live].argmin(axis=1) #first smallest time, the lower numbered block wins ties
+			current_time = times[live, k]
+			keep = (current_time <= T) & (count[live] < m)
+			live, k, current_time = live[keep], k[keep], current_time[keep]
+			if not len(live):
+				break
+			mi, mj, vi, vj = M[live, k], M[live, k+1], v[live, k], v[live, k+1]
+			records.append((live, current_time, k, x[live, k] + vi*current_time))
+			#the formulas of velocities, written out on columns
+			newi = ((mi - mj)/(mj + mi))*vi + ((2*mj)/(mj + mi))*vj
+			newj = ((mi - mj)/(mj + mi))*(-vj) + ((2*mi)/(mj + mi))*vi
+			x[live, k] = x[live, k] + current_time*(vi - newi)
+			x[live, k+1] = x[live, k+1] + current_time*(vj - newj)
+			v[live, k], v[live, k+1] = newi, newj
+			for d in (-1, 0, 1): #the same three times Heap.update changes
+				i = k + d
+				inside = (i >= 0) & (i < n-1)
+				rows = live[inside]
+				times[rows, i[inside]] = ensembleTimes(current_time[inside], rows, i[inside], x, v, T)
+			count[live] += 1
+	if not records:
+		empty = np.zeros(0)
+		return np.zeros(0, dtype=np.int64), empty, np.zeros(0, dtype=np.int64), empty
+	system, time, block, point = (np.concatenate(column) for column in zip(*records))
+	order = np.argsort(system, kind='stable') #steps are in time order, so a stable sort keeps every system in collision order
+	#rounded with the builtin round so every value is exactly the one listCollisions gives, numpy rounds differently at ties
+	time = np.array([round(value, 4) for value in time[order].tolist()])
+	point = np.array([round(value, 4) for value in point[order].tolist()])
+	return system[order], time, block[order], point
+	#O(steps*batch*n) for the argmin, steps is the largest number of collisions in one system
@@ -0,0 +1,106 @@
+import time
+
+#opt-in counters for the hot paths of patternMatching, random2 and collisions
+#the hooks only look at the module variable stats, so while it is None they cost one lookup per heap operation, match call or collision
+#counters are kept per process, the workers of the parallel functions do not report back
+
+stats = None #the active Stats, None while instrumentation is off
+
+class Stats:
+	#named counters, timings and sampled rates
+	#names used by the hooks:
+	#hash.windows, hash.candidates       windows hashed and windows whose hash equalled f(p) in modPatternMatch
+	#hash.verified, hash.collisions      candidates that verifyMatches kept and rejected, hash.checked is their sum
+	#random2.heap.ops, random2.heap.swaps, collisions.heap.ops, collisions.heap.swaps   sifts and levels moved by the heaps
+	#collisions.events                   collisions produced by CollisionSimulator, also sampled for events per second
+	#prime.select                        timing of randPrime
+
+	def __init__(self, every = 1024, callback = None):
+		self.counters = {} #name -> total
+		self.timings = {} #name -> [calls, total seconds, longest]
+		self.marks = {} #name -> [count, time] at the first and at the latest sample of tick
+		self.every = every #tick reads the clock once every this many calls
+		self.callback = callback #called as callback(name, value) for every add and every timing, e.g. to forward to a metrics server
+
+	def add(self, name, n = 1):
+		self.counters[name] = self.counters.get(name, 0) + n
+		if self.callback is not None:
+			self.callback(name, n)
+		#O(1)
+
+	def tick(self, name): #add(name) that also samples the clock, for rates such as events per second
+		self.add(name)
+		count = self.counters[name]
+		if count % self.every == 1 or self.every == 1:
+			now = time.perf_counter()
+			mark = self.marks.get(name)
+			if mark is None:
+				self.marks[name] = [count, now, count, now]
+			else:
+				mark[2], mark[3] = count, now
+		#O(1)
+
+	def rate(self, name): #calls of tick per second between the first and the latest sample, None before two samples
+		mark = self.marks.get(name)
+		if mark is None or mark[3] <= mark[1]:
+			return None
+		return (mark[2] - mark[0])/(mark[3] - mark[1])
+
+	def time(self, name, seconds):
+		timing = self.timings.get(name)
+		if timing is None:
+			timing = self.timings[name] = [0, 0.0, 0.0]
+		timing[0] += 1
+		timing[1] += seconds
+		timing[2] = max(timing[2], seconds)
+		if self.callback is not None:
+			self.callback(name, seconds)
+
+	def timer(self, name): #with stats.timer(name): ... records the time the block took
+		return Timer(self, name)
+
+	def ratio(self, name, total): #counters[name]/counters[total], None when total is 0
+		if not self.counters.get(total):
+			return None
+		return self.counters.get(name, 0)/self.counters[total]
+
+	def snapshot(self): #plain dict of everything recorded, with the derived ratios and rates
+		return {
+			"counters": dict(self.counters),
+			"timings": {name: {"calls": calls, "seconds": seconds, "longest": longest} for name, (calls, seconds, longest) in self.timings.items()},
+			"false positive rate": self.ratio("hash.collisions", "hash.checked"),
+			"random2 swaps per operation": self.ratio("random2.heap.swaps", "random2.heap.ops"),
+			"collisions swaps per operation": self.ratio("collisions.heap.swaps", "collisions.heap.ops"),
+			"events per second": self.rate("collisions.events"),
+		}
+
+	def reset(self):
+		self.counters.clear()
+		self.timings.clear()
+		self.marks.clear()
+
+class Timer:
+	__slots__ = ('stats', 'name', 'start')
+
+	def __init__(self, stats, name):
+		self.stats = stats
+		self.name = name
+
+	def __enter__(self):
+		self.start = time.perf_counter()
+		return self
+
+	def __exit__(self, *exc):
+		self.stats.time(self.name, time.perf_counter() - self.start)
+		return False
+
+def enable(new = None): #turns the hooks on, recording into new or a fresh Stats, and returns it
+	global stats
+	stats = new if new is not None else Stats()
+	return stats
+
+def disable(): #turns the hooks off and returns what was recorded
+	global stats
+	old = stats
+	stats = None
+	return old
@@ -1,60 +1,184 @@
+import concurrent.futures
+import functools
+import itertools
+import mmap
+import os
 import random
 import math
+from array import array
+
+import instrumentation
+try:
+	import numpy as np
+except ImportError: #numpy is only needed for the memory-mapped backend
+	np = None
+
+MAXNUMPYPRIME = 3037000499 #largest q for which q*q + q still fits in an int64
 
 def modpower(a, b, q): #Helper function
-	#helps in calculating a**b mod q in O(b) time and log2(q) bits
-	if b == 0:
-		return 1
-	else:
-		result = a%q
-		for i in range(b-1): #runs in O(b) time, each comparison takes O(log(q)) time
-			result = (result*(a%q))%q #because (xy)modq = ((x mod q)(y mod q))mod q
-			#as mod is being taken at every iteration, it is ensured that space complexity bounds are met
-		return result
-	#O(blog(q)) time and O(log(q)) space
-		
-def randPrime(N): #pre implemented
-	primes = []
-	for q in range(2,N+1):
-		if(isPrime(q)):
-			primes.append(q)
-	return primes[random.randint(0,len(primes)-1)]
-
-def isPrime(q): #pre implemented
-	if(q > 1):
-		for i in range(2, int(math.sqrt(q)) + 1):
-			if (q % i == 0):
-				return False
-		return True
-	else:
+	#helps in calculating a**b mod q in O(logb) time and log2(q) bits by square-and-multiply
+	result = 1
+	square = a%q #holds (a**(2**j)) mod q for the jth bit of b
+	while b > 0: #runs once per bit of b, each multiplication takes O(log(q)) time
+		if b & 1: #this power of two is part of b
+			result = (result*square)%q #because (xy)modq = ((x mod q)(y mod q))mod q
+		square = (square*square)%q
+		b >>= 1
+		#as mod is being taken at every iteration, it is ensured that space complexity bounds are met
+	return result
+	#O(logb*log(q)) time and O(log(q)) space
+
+def randPrime(N, cached = False):
+	#returns a prime chosen uniformly at random from the primes in [2,N]
+	if instrumentation.stats is not None:
+		with instrumentation.stats.timer("prime.select"):
+			return pickPrime(N, cached)
+	return pickPrime(N, cached)
+
+def pickPrime(N, cached): #Helper function, the body of randPrime
+	#a uniform candidate from [2,N] is accepted if it is prime, so every prime is equally likely, exactly as when picking from the full list
+	#by the prime number theorem about ln(N) candidates are tried on average
+	if N < 2:
+		raise ValueError("there is no prime less than or equal to %d" % N)
+	if cached: #for repeated calls with the same N a sieve answers each test in O(1)
+		sieve = primeSieve(N)
+		while True:
+			q = random.randint(2, N)
+			if sieve[q]:
+				return q
+	while True:
+		q = random.randint(2, N)
+		if isPrime(q):
+			return q
+	#O(log(N)) candidates, each tested in O(log(N)**3) time, instead of O(N*sqrt(N)) for sieving by trial division
+
+MILLERRABINBASES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37) #deterministic for every q below 3.3*10**24
+
+def isPrime(q):
+	#Miller-Rabin test, with the bases above it never errs for the q that findN can produce
+	if q < 2:
 		return False
+	for a in MILLERRABINBASES:
+		if q % a == 0:
+			return q == a
+	d = q - 1 #write q-1 as d*2**s with d odd
+	s = 0
+	while d % 2 == 0:
+		d //= 2
+		s += 1
+	for a in MILLERRABINBASES:
+		y = pow(a, d, q)
+		if y == 1 or y == q - 1:
+			continue
+		for i in range(s - 1):
+			y = (y*y)%q
+			if y == q - 1:
+				break
+		else:
+			return False #a is a witness that q is composite
+	return True
+	#O(log(q)**3) time
+
+@functools.lru_cache(maxsize = 4)
+def primeSieve(N): #Helper function
+	#sieve of Eratosthenes, sieve[i] is 1 exactly when i is prime
+	#kept in a small cache since randPatternMatch asks for the same N again whenever the pattern length and eps repeat
+	sieve = bytearray([1])*(N+1)
+	sieve[0:2] = b'\x00\x00'
+	for i in range(2, math.isqrt(N) + 1):
+		if sieve[i]:
+			sieve[i*i::i] = bytes(len(range(i*i, N+1, i))) #crossing out is done by a slice assignment instead of a Python loop
+	return sieve
+	#O(NloglogN) time and O(N) bytes of space
 
-def randPatternMatch(eps,p,x): #pre implemented
-	N = findN(eps,len(p))
-	q = randPrime(N) #q is O(N) space
+def randPatternMatch(eps,p,x,base = 26): #pre implemented
+	#the prime, f(p)%q and (base**(m-1))%q are cached in the compiled pattern, so repeated queries with the same p and eps skip them
+	#N = findN(eps,len(p)) and q = randPrime(N), q is O(N) space
 	#from our choice of N, N is O(log(m/eps)) space
 	
-	return modPatternMatch(q,p,x)
-	#modPatternMatch runs in O((n+m)logq) time
+	return compile(p,eps,False,base).findall(x)
+	#the compiled pattern runs the same rolling hash as modPatternMatch, in O((n+m)logq) time
 	#and q is O(log(m/eps))
 	#hence randPatternMatch runs in O((n+m)log(m/eps)) time
 	#similarly as space taken by modPatternMatch is O(k+logq+logn)
 	#due to q being O(log(m/eps)), we get overall space complexity of randPatternMatch as O(k+logn+log(m/eps))
 
-def randPatternMatchWildcard(eps,p,x): #pre implemented
-	N = findN(eps,len(p))
-	q = randPrime(N) #q is O(N) space
+def randPatternMatchWildcard(eps,p,x,base = 26): #pre implemented
+	#N = findN(eps,len(p)) and q = randPrime(N), q is O(N) space, both cached in the compiled pattern
 	#from our choice of N, N is O(log(m/eps)) space
-	return modPatternMatchWildcard(q,p,x)
-	#modPatternMatchWildcard runs in O((n+m)logq) time
+	return compile(p,eps,True,base).findall(x)
+	#the compiled pattern runs the same rolling hash as modPatternMatchWildcard, in O((n+m)logq) time
 	#and q is O(log(m/eps))
 	#hence randPatternMatchWildcard runs in O((n+m)log(m/eps)) time
 	#similarly as space taken by modPatternMatchWildcard is O(k+logq+logn)
 	#due to q being O(log(m/eps)), we get overall space complexity of randPatternMatchWildcard as O(k+logn+log(m/eps))
 	
-def findN(eps,m): 
-	N = int((4*(m/eps)*math.log(26,2))*math.log(4*(m/eps)*math.log(26,2), 2)) + 1
+def randPatternMatchMulti(eps,patterns,x,base = 26):
+	k = len(patterns)
+	if k == 0:
+		return []
+	N = findN(eps/k,max(len(p) for p in patterns),base)
+	#every window of x is now compared against all k patterns, so by the union bound we ask for eps/k per pattern
+	#this keeps the probability that a window is falsely reported for any of the patterns below eps
+	q = randPrime(N) #one prime is shared by all the patterns
+	return modPatternMatchMulti(q,patterns,x,base)
+	#modPatternMatchMulti makes one pass over x per distinct pattern length instead of one pass per pattern
+	#hence randPatternMatchMulti runs in O((l*n + M)log(kM/eps)) time where l is the number of distinct lengths and M the total pattern length
+
+def randPatternMatchVerified(eps,p,x,base = 26):
+	#Las Vegas version of randPatternMatch, every offset that is returned is a real match
+	#returns (offsets, number of hash collisions that were rejected)
+	N = findN(eps,len(p),base)
+	q = randPrime(N)
+	return verifyMatches(p,x,modPatternMatch(q,p,x,base),False)
+	#O((n+m)log(m/eps) + k*m) time, eps now only bounds the expected number of wasted comparisons
+
+def randPatternMatchWildcardVerified(eps,p,x,base = 26):
+	#Las Vegas version of randPatternMatchWildcard, '?' and classes are checked as in modPatternMatchWildcard
+	N = findN(eps,len(p),base)
+	q = randPrime(N)
+	return verifyMatches(p,x,modPatternMatchWildcard(q,p,x,base))
+
+def matchesAt(positions,x,i): #Helper function
+	#checks character by character whether the parsed pattern occurs in x at offset i
+	for j in range(len(positions)):
+		c = positions[j]
+		if c is None: #a '?' matches any character
+			continue
+		d = x[i+j]
+		if isinstance(d, str): #positions hold character codes, indexing bytes already gives one
+			d = ord(d)
+		if isinstance(c, frozenset):
+			if d not in c:
+				return False
+		elif c != d:
+			return False
+	return True
+	#O(m) time
+
+def verifyMatches(p,x,candidates,wildcard = True): #Helper function
+	#keeps the candidates that really are matches and counts the ones that were hash collisions
+	positions = parsePattern(p) if wildcard else list(charCodes(p))
+	result = []
+	collisions = 0
+	for i in candidates:
+		if matchesAt(positions,x,i):
+			result += [i]
+		else:
+			collisions += 1
+	if instrumentation.stats is not None:
+		instrumentation.stats.add("hash.verified", len(result))
+		instrumentation.stats.add("hash.collisions", collisions)
+		instrumentation.stats.add("hash.checked", len(result) + collisions)
+	return result, collisions
+	#O(k*m) time for k candidates
+
+def findN(eps,m,base = 26): 
+	N = int((4*(m/eps)*math.log(base,2))*math.log(4*(m/eps)*math.log(base,2), 2)) + 1
 	return N
+	#base is the size of the alphabet: 26 for text over A to Z, 256 for bytes (and so for UTF-8 encoded text), 0x110000 for any str
+	#only differences of character codes matter below, so codes may start anywhere (A is 65) as long as they span fewer than base values
+	#the matchers check that with checkDigits and raise ValueError otherwise, findN gets the same base so the bound holds for every text they accept
 	
 	#EXPLANATION FOR FINDN
 	#We have been given a probability bound eps
@@ -66,41 +190,43 @@ def findN(eps,m):
 	#we can use the statements provided in the assignment
 	#firstly the number of primes of a number d is less than log(d)
 	#we want log(d)/pi(N) to be less than eps which means pi(N) should be greater than log(d)/eps
-	#d is the difference a~b which is less than 26^m
-	#hence we want pi(N) greater than mlog(26)/eps, lets call this c
+	#d is the difference a~b which is less than base^m
+	#hence we want pi(N) greater than mlog(base)/eps, lets call this c
 	#using the statement given that pi(N) is greater than N/2log(N)
 	#we can write pi(klogk) > klog(k)/2log(klogk) = klogk/2(log(k) + loglog(k)) > klogk/2(2log(k)) = k/4
 	#hence I can use my N to be 4clog(4c) as I proved it is greater than c
 	#so N = 4c(2+log(c))
 
-def modPatternMatch(q,p,x):
+def modPatternMatch(q,p,x,base = 26):
 	m = len(p) #to avoid using len() again and again
 	t = len(x) #to avoid using len() again and again
 	result = [] #final list to be returned
+	if m == 0 or m > t: #no window of length m to compare with
+		return result
+	checkDigits(checkDigits(None, p, base), x, base) #the digits of p and x must fit in base, see checkDigits
 		
 	fp = 0 #f(p)%q that we will calculate is stored in this variable
 	value = 0 #the hash function for the first m values of the text calculated as f(x[i..m]) mod q
-	space = modpower(26, m-1, q) #using the modpower function that we defined to calculate (26**(m-1)) mod q
-	#this takes O(logq) bits and runs in O(mlogq) time hence is much better in terms of space than directly calculating 26**(m-1)
-	
-	prev = 1 #helper variable for calculating the value and fp 
+	space = modpower(base, m-1, q) #using the modpower function that we defined to calculate (base**(m-1)) mod q
+	#this takes O(logq) bits and runs in O(logm*logq) time hence is much better in terms of space than directly calculating base**(m-1)
 	
-	for i in range(m-1, -1, -1): #for calculation of fp and value 
-		fp = (fp + (((ord(p[i])-65)%q)*(prev%q))%q)%q 
-		value = (value + (((ord(x[i])-65)%q)*(prev%q))%q)%q
-		prev = (prev*(26%q))%q #the helper variable, made such that space constraints are met as always log(q) bits are being stored
-		#and helps calculate (26**(m-i-1)) mod q without using any extra space or extra time
+	for c, d in zip(charCodes(p), charCodes(x)): #for calculation of fp and value by Horner's rule
+		fp = (fp*base + c)%q
+		value = (value*base + d)%q
+		#each step multiplies what was summed so far by base, so the jth character ends up multiplied by (base**(m-j-1)) mod q
 	
 	if value == fp: #checking whether the first m sized substring has same hash value as f(p) mod q
 		result += [0] 
 	
-	for i in range(m, t): #checking for the other substrings one by one
-		value = ((((value - (((ord(x[i-m])-65)%q)*space)%q)%q)*(26%q))%q + (ord(x[i]) - 65)%q)%q
-		#from moving from one substring to the next, we subtract the value of the first letter (taking into account its significance in powers of 26) of that substring mod q
-		#then we add the immediate next letter and the middle letters are multiplied with 26 (taking into account mod q everywhere for space complexity bounds)
+	i = m
+	for out, d in zip(charCodes(x), charCodes(x, m)): #checking for the other substrings one by one, out is x[i-m] and d is x[i]
+		value = ((value - out*space)*base + d)%q
+		#from moving from one substring to the next, we subtract the value of the first letter (taking into account its significance in powers of base) of that substring
+		#then we add the immediate next letter and the middle letters are multiplied with base (taking mod q at every step for space complexity bounds)
 		
 		if value == fp: #if hash equals fp mod q then add to the result list
 			result += [i-m+1] 
+		i += 1
 			
 		#this runs in O(nlog2q) time
 		#loop runs in O(n) time
@@ -109,75 +235,522 @@ def modPatternMatch(q,p,x):
 	#hence overall time complexity of modPatternMatch is O((m+n)log(q) time
 	
 	#Space taken at every step is ensured to be O(logq) bits as we keep taking mod q at every step,
-	#even for calculations we have ensured taking mod q after every multiplication
 	#O(logn) is the value of the index i while iterating to check the various substrings
 	#O(k) space is for the final list that is being returned
 	#Hence overall space omplexity comes out to be O(k + logn + logq)
-			
+	
+	if instrumentation.stats is not None:
+		instrumentation.stats.add("hash.windows", t-m+1)
+		instrumentation.stats.add("hash.candidates", len(result))
 	return result
 
-def modPatternMatchWildcard(q,p,x):
-	m = len(p) #to avoid using len() again and again
+def charCodes(x, start = 0): #Helper function
+	#iterates over the character codes of x from offset start, the values of the bytes for bytes-like x and the code points for a str
+	#the digits are the codes themselves, the 65 that the assignment subtracted for A cancels out in every comparison of two hashes
+	#map(ord, ...) and iterating over bytes both run in C, so none of the matching loops calls ord() per character
+	codes = map(ord, x) if isinstance(x, str) else iter(x)
+	if start:
+		return itertools.islice(codes, start, None)
+	return codes
+
+def codeRange(x): #Helper function
+	#(smallest, largest) character code of x, None when x is empty
+	#the distinct codes are collected first, a frozenset of bytes is built in C about four times faster than min and max scan them
+	if not len(x):
+		return None
+	if isinstance(x, str):
+		try:
+			x = x.encode('latin-1') #same codes for a str below 256
+		except UnicodeEncodeError:
+			return ord(min(x)), ord(max(x))
+	present = frozenset(x)
+	return min(present), max(present)
+
+def checkDigits(span, x, base): #Helper function
+	#span is the (smallest, largest) code seen so far or None, returns it widened by the codes of x
+	#raises ValueError once the codes no longer fit in base consecutive values, since f would then map different strings to the same number
+	#(with base 26 'Aa' and 'BG' both give 65*26+97 == 66*26+71) and no choice of prime could keep the error bound of findN
+	r = codeRange(x)
+	if r is None:
+		return span
+	lo, hi = r if span is None else (min(span[0], r[0]), max(span[1], r[1]))
+	if hi - lo >= base:
+		raise ValueError("character codes %d to %d span more than base = %d values, use base = 256 for bytes or 0x110000 for any str" % (lo, hi, base))
+	return lo, hi
+	#O(len(x)) time in C
+
+def modPatternMatchWildcard(q,p,x,base = 26):
+	#a '?' in p matches any character and a class such as [ABC] matches any one of the characters inside the brackets
+	#there can be any number of both, see Pattern.finditer for how the hash is kept up to date
+	return list(modPatternMatchWildcardStream(q,p,x,base))
+	#O((n+m)logq + n*(r+c)) time where r is the number of runs of '?' and classes and c the number of classes
+	#O(k + m + logn + logq) space
+
+def parsePattern(p): #Helper function
+	#returns one entry per position of the pattern: the character code, None for a '?', or a frozenset of codes for a class
+	#p may be a str or bytes, '?', '[' and ']' are 63, 91 and 93 in both
+	codes = list(charCodes(p))
+	positions = []
+	i = 0
+	while i < len(codes):
+		if codes[i] == 63:
+			positions.append(None)
+		elif codes[i] == 91:
+			try:
+				j = codes.index(93, i+1)
+			except ValueError:
+				raise ValueError("unterminated character class in %r" % (p,))
+			positions.append(frozenset(codes[i+1:j]))
+			i = j
+		else:
+			positions.append(codes[i])
+		i += 1
+	return positions
+	#O(len(p)) time
+
+def maskBoundaries(positions, q, base = 26): #Helper function
+	#the hash of a window only counts the positions holding a plain character, a '?' or a class contributes 0
+	#when the window moves one step, a character moves from position k to k-1 and keeps its status unless it crosses the edge of a masked run
+	#returns the pairs (k, weight) for those edges, value += digit*weight moves the character at k in or out of the hash
+	#the weight is (base**(m-1-k)) mod q, negated when the character stops being counted
+	m = len(positions)
+	edges = []
+	for k in range(m):
+		counted = isinstance(positions[k], int)
+		before = k > 0 and isinstance(positions[k-1], int) #the character at k moves to k-1, position -1 is outside the window
+		if counted != before:
+			weight = modpower(base, m-1-k, q)
+			edges.append((k, -weight if counted else weight))
+	return edges
+	#O(mlogm) time, only the O(r) edges of the masked runs are stored
+
+def modPatternMatchMulti(q,patterns,x,base = 26):
 	t = len(x) #to avoid using len() again and again
-	result = [] #final list to be returned
-	
-	if m > len(x):
-		return []
-	else:
-		wildcard = 0 #index of the wildcard
-		for i in range(m): #loop to find the index of the wildcard 
-			if p[i] == '?':
-				wildcard = i
+	result = [[] for j in range(len(patterns))] #one list of offsets per pattern, in the order the patterns were given
+
+	span = checkDigits(None, x, base)
+	for p in patterns:
+		span = checkDigits(span, p, base)
+	groups = {} #maps a pattern length to a table of f(p)%q -> ids of the patterns of that length with that hash
+	for j in range(len(patterns)):
+		m = len(patterns[j])
+		if m == 0 or m > t: #such patterns can never match, their list stays empty
+			continue
+		fp = 0
+		for c in charCodes(patterns[j]): #Horner's rule, gives the same f(p)%q as the loop in modPatternMatch
+			fp = (fp*base + c)%q
+		table = groups.setdefault(m, {})
+		table.setdefault(fp, []).append(j) #equal patterns share the same entry
+
+	for m, table in groups.items(): #one rolling hash for every distinct length
+		space = modpower(base, m-1, q) #(base**(m-1)) mod q, same as in modPatternMatch
+		value = 0
+		for d in itertools.islice(charCodes(x), m):
+			value = (value*base + d)%q
+
+		ids = table.get(value) #a single dictionary lookup replaces the comparison with every pattern of this length
+		if ids is not None:
+			for j in ids:
+				result[j] += [0]
+
+		i = m
+		for out, d in zip(charCodes(x), charCodes(x, m)):
+			value = ((value - out*space)*base + d)%q #same update as in modPatternMatch
+			ids = table.get(value)
+			if ids is not None:
+				for j in ids:
+					result[j] += [i-m+1]
+			i += 1
+
+	#the loop over x runs once per distinct length l, each iteration does O(1) arithmetic on O(logq) bits and one dictionary lookup
+	#hence overall time complexity is O((l*n + M)log(q)) where M is the total length of the patterns
+	#space is O(k + logn + logq) for the results and the rolling values plus O(number of patterns) for the tables
+	return result
+
+def textChunks(x, chunksize = 1 << 16): #Helper function
+	#turns the text into an iterable of chunks so that the streaming matchers never need the whole text in memory
+	if isinstance(x, (str, bytes, bytearray, memoryview)): #a text that is already in memory is just sliced
+		if isinstance(x, memoryview):
+			x = x.cast('B') #slices of a memoryview are not copied
+		for i in range(0, len(x), chunksize):
+			yield x[i:i+chunksize]
+	elif hasattr(x, 'read'): #file objects are read chunksize characters (or bytes) at a time
+		while True:
+			chunk = x.read(chunksize)
+			if not chunk:
 				break
-		fp = 0 #f(p)%q that we will calculate is stored in this variable
-		value = 0 #the hash function for the first m values of the text calculated as f(x[i..m]) mod q
-		space = modpower(26, m-1, q) #using the modpower function that we defined to calculate (26**(m-1)) mod q
-		#this takes O(logq) bits and runs in O(mlogq) time hence is much better in terms of space than directly calculating 26**(m-1)
-		smallspace = modpower(26, m-wildcard-1, q) #similarly calculating (26**(m-1-wildcard))
-		prev = 1
-		
-		for i in range(m-1, wildcard, -1):
-			fp =(fp + (((ord(p[i])-65)%q)*((prev%q))%q))%q
-			value = (value + (((ord(x[i])-65)%q)*(prev%q))%q)%q
-			prev = (prev*(26%q))%q
-			
-		prev = (prev*(26%q))%q
-		for i in range(wildcard-1, -1, -1):
-			fp =(fp + (((ord(p[i])-65)%q)*((prev%q))%q))%q
-			value = (value + (((ord(x[i])-65)%q)*(prev%q))%q)%q
-			prev = (prev*(26%q))%q
-		
-		#The above two loops are the same as ModPatternMatch except that we do not add the value at the index in the substring corresponding to the wildcard position in the pattern
-		#hence that index is not added or treated as an A which has value 0
-		#in our pattern also we are treating the ? as an A so that we have a match at that corresponding index
-			
-		if value == fp: #checking whether the first m sized substring has same hash value as f(p) mod q
-			result += [0]
-
-		for i in range(m, t):#checking for the other substrings one by one
-			value = ((((value + (((ord(x[i - m + wildcard])-65)%q)*smallspace)%q - (((ord(x[i-m])-65)%q)*space)%q)%q)*(26%q))%q + ((ord(x[i]) - 65))%q - (((ord(x[i-m + wildcard+1])-65)%q)*smallspace)%q)%q
-			#from moving from one substring to the next, we subtract the value of the first letter (taking into account its significance in powers of 26) of that substring mod q
-			#we also have to add back the value at the previous wildcard and subtract the value at the position of the wildcard in the next substring
-			#this is done because for our wildcard we treat both the ? and the corresponding index in the substring as A so that they match at that position always
-			#then we add the immediate next letter and the middle letters are multiplied with 26 (taking into account mod q everywhere for space complexity bounds)
-			
-			if value == fp: #if hash equals fp mod q then add to the result list
-				result += [i-m+1]			
+			yield chunk
+	else: #any other iterable is assumed to already yield chunks
+		for chunk in x:
+			yield chunk
+	#O(chunksize) space
+
+def chunkCodes(chunk): #Helper function
+	#the character codes of one chunk, as a sequence that can be indexed and concatenated
+	#bytes are used as they are since indexing them already gives the codes
+	#a str whose characters are all below 256 is encoded to latin-1, which is one C call and gives bytes with the same codes
+	#any other str becomes an array of 4-byte code points
+	if isinstance(chunk, str):
+		try:
+			return chunk.encode('latin-1')
+		except UnicodeEncodeError:
+			return array('I', map(ord, chunk))
+	if isinstance(chunk, bytes):
+		return chunk
+	return bytes(chunk)
+	#O(chunk) time and space, done once per chunk instead of calling ord() for every character in the loops
+
+def joinCodes(carry, codes): #Helper function
+	#carry + codes for the streaming loop, one of them may be bytes and the other an array when the chunks of a str differ
+	if type(carry) is not type(codes):
+		return array('I', iter(carry)) + array('I', iter(codes)) #iter, since array('I', bytes) would read the raw bytes as 4-byte items
+	return carry + codes
+
+def randPatternMatchStream(eps,p,x,base = 26):
+	N = findN(eps,len(p),base)
+	q = randPrime(N)
+	return modPatternMatchStream(q,p,x,base)
+
+def randPatternMatchWildcardStream(eps,p,x,base = 26):
+	N = findN(eps,len(p),base)
+	q = randPrime(N)
+	return modPatternMatchWildcardStream(q,p,x,base)
+
+def modPatternMatchStream(q,p,x,base = 26):
+	#same matches as modPatternMatch(q,p,x) but x may be a str, bytes, a file object or an iterable of chunks
+	#the offsets are yielded one by one as soon as they are found instead of being collected in a list
+	return compiledPattern(p,q,False,base).finditer(x)
+	#O((n+m)logq) time as in modPatternMatch, O(m + chunk + logn + logq) space since no list of offsets is kept
+
+def modPatternMatchWildcardStream(q,p,x,base = 26):
+	#streaming counterpart of modPatternMatchWildcard, yields the same offsets lazily
+	return compiledPattern(p,q,True,base).finditer(x)
+
+class Pattern:
+	#a pattern together with everything the rolling hash needs that does not depend on the text
+	#built once, then every text only pays for the pass over its own characters, in the style of re.compile
+	#with wildcard = False every character of p is literal as in modPatternMatch, otherwise '?' and classes are parsed as in modPatternMatchWildcard
+	#base is the size of the alphabet as in findN, 256 to match bytes
+
+	def __init__(self, p, q, wildcard = False, base = 26):
+		self.pattern = p
+		self.q = q
+		self.wildcard = wildcard
+		self.base = base
+		self.positions = parsePattern(p) if wildcard else list(charCodes(p))
+		self.m = len(self.positions)
+		self.fp = 0 #f(p)%q with every '?' and class contributing 0
+		for c in self.positions:
+			self.fp = (self.fp*base + (c if isinstance(c, int) else 0))%q
+		self.edges = maskBoundaries(self.positions, q, base) #for an exact pattern this is just [(0, -(base**(m-1)) mod q)], the update of modPatternMatch
+		self.classes = [(j, c) for j, c in enumerate(self.positions) if isinstance(c, frozenset)] #checked directly on the candidates
+		self.last = self.m > 0 and isinstance(self.positions[self.m-1], int) #whether the character entering the window is counted
+		self.exact = all(isinstance(c, int) for c in self.positions) #no '?' or class, the plain update of modPatternMatch is enough
+		self.space = modpower(base, self.m-1, q) if self.m else 0 #(base**(m-1)) mod q as in modPatternMatch
+		digits = [c for c in self.positions if isinstance(c, int)] + [d for c in self.positions if isinstance(c, frozenset) for d in c]
+		self.span = checkDigits(None, digits, base) #every text is checked against it, see checkDigits
+		#O(mlogm) time, done once per pattern
+
+	def scan(self, x): #Helper function
+		#the loop of modPatternMatch with fp and space taken from the pattern, for an exact pattern and a text already in memory
+		m = self.m
+		t = len(x)
+		if m > t:
+			return
+		q = self.q
+		base = self.base
+		checkDigits(self.span, x, base)
+		fp = self.fp
+		space = self.space
+		value = 0
+		for d in charCodes(x[:m]):
+			value = (value*base + d)%q
+		candidates = 0
+		if value == fp:
+			candidates += 1
+			yield 0
+		i = 1 #offset of the window after the shift
+		for out, d in zip(charCodes(x), charCodes(x, m)):
+			value = ((value - out*space)*base + d)%q
+			if value == fp:
+				candidates += 1
+				yield i
+			i += 1
+		if instrumentation.stats is not None:
+			instrumentation.stats.add("hash.windows", t-m+1)
+			instrumentation.stats.add("hash.candidates", candidates)
+		#O(nlogq) time as in modPatternMatch, without the O(mlogq) for fp and space
+
+	def finditer(self, x):
+		#yields the offsets at which the pattern matches x
+		#x may be a str, bytes, bytearray, memoryview, a file object or an iterable of chunks
+		m = self.m
+		if m == 0:
+			return
+		if self.exact and isinstance(x, (str, bytes, bytearray, memoryview)): #no mask and no chunks to carry over
+			yield from self.scan(x.cast('B') if isinstance(x, memoryview) else x)
+			return
+		q = self.q
+		base = self.base
+		fp = self.fp
+		positions = self.positions
+		edges = self.edges
+		classes = self.classes
+		last = self.last
+
+		#value is the masked hash of the current window, already corrected for the shift to the next window
+		#i.e. the characters at the edges of the masked runs have been moved in or out of the sum, so the next window only needs *base and the new character
+		#this touches O(r) characters per shift however many '?' the pattern has, and all of them are still among the m-1 carried ones
+		value = 0
+		carry = None #codes of the last m-1 characters of the text read so far
+		start = 0 #offset in the text of carry[0]
+		candidates = 0 #windows whose hash equalled fp, for instrumentation
+		span = self.span
+		for chunk in textChunks(x):
+			codes = chunkCodes(chunk)
+			span = checkDigits(span, codes, base) #the whole text is checked as it streams by, see checkDigits
+			skip = len(carry) if carry else 0
+			buf = joinCodes(carry, codes) if carry else codes #only O(m + chunk) codes are ever held
+			for i in range(skip, len(buf)):
+				g = start + i #offset of buf[i] in the text
+				if g >= m-1:
+					counted = last
+				else: #still filling the first window, buf[i] is at position g of it
+					counted = isinstance(positions[g], int)
+				value = (value*base + (buf[i] if counted else 0))%q
+				if g >= m-1:
+					s = i - m + 1 #the window is buf[s..i]
+					if value == fp:
+						candidates += 1
+						for j, c in classes:
+							if buf[s+j] not in c:
+								break
+						else:
+							yield g - m + 1
+					for k, weight in edges:
+						value += buf[s+k]*weight
+					value %= q
+			keep = min(len(buf), m-1)
+			start += len(buf) - keep
+			carry = buf[len(buf)-keep:]
+		if instrumentation.stats is not None: #only reached when the whole text was read, search stops early
+			instrumentation.stats.add("hash.windows", max(0, start + (len(carry) if carry else 0) - m + 1))
+			instrumentation.stats.add("hash.candidates", candidates)
+		#O(n(r+c)logq) time and O(m + chunk + logn + logq) space
+
+	def findall(self, x): #list of all the offsets, as returned by modPatternMatch
+		return list(self.finditer(x))
+
+	def search(self, x): #first offset at which the pattern matches x, or None
+		return next(self.finditer(x), None)
+
+	def findbatch(self, records, offsets = None):
+		#matches every record of a batch in one call
+		#records is either a list of strings (or bytes), or one concatenated string with offsets such that record r is records[offsets[r]:offsets[r+1]]
+		#returns two int64 arrays (ids, found): the pattern occurs at offset found[j] of record ids[j]
+		#the hash starts again at every record boundary, so a match never spans two records
+		#every record is hashed on its own, the records are never joined into one buffer
+		if offsets is not None:
+			text = records
+			records = (text[offsets[r]:offsets[r+1]] for r in range(len(offsets) - 1))
+		m = self.m
+		q = self.q
+		base = self.base
+		fp = self.fp
+		ids = array('q')
+		found = array('q')
+		if m == 0:
+			return ids, found
+		span = self.span
+
+		if self.exact: #the update of modPatternMatch, with fp and space computed once for all the records
+			space = self.space
+			windows = 0
+			for r, record in enumerate(records):
+				if len(record) < m: #too short to contain a match
+					continue
+				span = checkDigits(span, record, base)
+				windows += len(record) - m + 1
+				value = 0
+				for d in charCodes(record[:m]):
+					value = (value*base + d)%q
+				if value == fp:
+					ids.append(r)
+					found.append(0)
+				i = 1
+				for out, d in zip(charCodes(record), charCodes(record, m)):
+					value = ((value - out*space)*base + d)%q
+					if value == fp:
+						ids.append(r)
+						found.append(i)
+					i += 1
+			if instrumentation.stats is not None:
+				instrumentation.stats.add("hash.windows", windows)
+				instrumentation.stats.add("hash.candidates", len(found))
+			return ids, found
+
+		positions = self.positions
+		edges = self.edges
+		classes = self.classes
+		last = self.last
+		for r, record in enumerate(records):
+			if len(record) < m:
+				continue
+			codes = chunkCodes(record)
+			span = checkDigits(span, codes, base)
+			value = 0
+			for i in range(m-1): #the first window of the record, minus its last character
+				value = (value*base + (codes[i] if isinstance(positions[i], int) else 0))%q
+			for i in range(m-1, len(codes)): #same update as in finditer
+				value = (value*base + (codes[i] if last else 0))%q
+				s = i - m + 1
+				if value == fp:
+					for j, c in classes:
+						if codes[s+j] not in c:
+							break
+					else:
+						ids.append(r)
+						found.append(s)
+				for k, weight in edges:
+					value += codes[s+k]*weight
+				value %= q
+		return ids, found
+		#O(total length*logq) time for an exact pattern and O(total length*(r+c)logq) with a mask, O(k + longest record) space
+
+def randPatternMatchBatch(eps,p,records,offsets = None,base = 26):
+	return compile(p,eps,False,base).findbatch(records,offsets)
+
+def modPatternMatchBatch(q,p,records,offsets = None,base = 26):
+	#the same matches as calling modPatternMatch(q,p,record) for every record, see Pattern.findbatch for the arguments
+	return compiledPattern(p,q,False,base).findbatch(records,offsets)
+
+@functools.lru_cache(maxsize = 4096)
+def compiledPattern(p, q, wildcard = False, base = 26):
+	#cache behind the function API, so the same (p, q) is only prepared once
+	return Pattern(p, q, wildcard, base)
+
+@functools.lru_cache(maxsize = 4096)
+def compile(p, eps, wildcard = False, base = 26):
+	#compiles p with a prime chosen for the error bound eps, repeated calls with the same arguments return the same object
+	N = findN(eps,len(p),base)
+	return Pattern(p, randPrime(N), wildcard, base)
+
+def randPatternMatchMmap(eps,p,filename,blocksize = 1 << 20,base = 26):
+	N = findN(eps,len(p),base)
+	q = randPrime(min(N, MAXNUMPYPRIME)) #N is far below this bound for any sensible eps
+	return modPatternMatchMmap(q,p,filename,blocksize,base)
+
+def windowHashes(d, m, q, base = 26): #Helper function
+	#d is an int64 array of digits already reduced mod q
+	#returns the array whose ith entry is f(d[i..i+m-1]) mod q, for every window of length m
+	#windows of length a and b are joined as f(i, a+b) = f(i, a)*base^b + f(i+a, b), so only O(log m) array operations are needed
+	n = len(d)
+	result = None
+	length = 0 #window length that result currently holds
+	g = d #hashes of the windows of length glen
+	glen = 1
+	bits = m
+	while bits:
+		if bits & 1:
+			if result is None:
+				result, length = g, glen
+			else:
+				k = n - length - glen + 1 #number of windows of the combined length
+				result = (result[:k]*modpower(base, glen, q) + g[length:length+k])%q
+				length += glen
+		bits >>= 1
+		if bits:
+			k = n - 2*glen + 1
+			g = (g[:k]*modpower(base, glen, q) + g[glen:glen+k])%q #windows of twice the length
+			glen *= 2
+	return result
+	#every product is less than q*q, so with q <= MAXNUMPYPRIME nothing overflows an int64
+	#O(nlogm) work done in O(logm) vectorized passes
+
+def modPatternMatchMmap(q,p,filename,blocksize = 1 << 20,base = 26):
+	#same matches as modPatternMatch(q,p,x) where x is the content of the file
+	#the file is memory-mapped as bytes and the hashes of all windows of a block are computed at once with numpy
+	if np is None:
+		raise ImportError("modPatternMatchMmap requires numpy")
+	if q > MAXNUMPYPRIME:
+		raise ValueError("q must be at most %d so that the products fit in an int64" % MAXNUMPYPRIME)
+	m = len(p)
+	result = []
+	if m == 0 or os.path.getsize(filename) < m: #no window of length m, and numpy cannot map an empty file
 		return result
-		#this runs in O(nlog2q) time
-		#loop runs in O(n) time
-		#each iteration of the loop compares O(log2q) bits
-		
-		
-	#hence overall time complexity of modPatternMatch is O((m+n)log(q) time
 
-		
-	#Space taken at every step is ensured to be O(logq) bits as we keep taking mod q at every step,
-	#even for calculations we have ensured taking mod q after every multiplication
-	#O(logn) is the value of the index i while iterating to check the various substrings
-	#O(k) space is for the final list that is being returned
-	#Hence overall space omplexity comes out to be O(k + logn + logq)
-		
-	
+	fp = 0 #f(p)%q
+	for c in charCodes(p):
+		fp = (fp*base + c)%q
+	span = checkDigits(None, p, base)
 
+	data = np.memmap(filename, dtype=np.uint8, mode='r')
+	t = len(data)
+	for start in range(0, t-m+1, blocksize):
+		#the block holds the windows starting in [start, start+blocksize), so it needs m-1 extra characters
+		block = data[start:min(t, start+blocksize+m-1)]
+		span = checkDigits(span, (int(block.min()), int(block.max())), base) #numpy finds the extremes, checkDigits only sees those two
+		d = block.astype(np.int64)%q #the byte values are the digits, as in charCodes
+		hashes = windowHashes(d, m, q, base)
+		result.extend((np.flatnonzero(hashes == fp) + start).tolist()) #the candidates of this block
+	del data
+	return result
+	#O(nlogm) arithmetic, but done by numpy instead of the interpreter
+	#O(k + blocksize) space, the file itself is paged in by the operating system
+
+def randPatternMatchParallel(eps,p,x,workers = None,shardsize = None,base = 26):
+	N = findN(eps,len(p),base)
+	q = randPrime(N) #chosen once, every shard is matched with the same prime so the error bound is that of randPatternMatch
+	return modPatternMatchParallel(q,p,x,workers,shardsize,base)
+
+def randPatternMatchFileParallel(eps,p,filename,workers = None,shardsize = None,base = 26):
+	N = findN(eps,len(p),base)
+	q = randPrime(N)
+	return modPatternMatchFileParallel(q,p,filename,workers,shardsize,base)
+
+def shardBounds(t, m, workers, shardsize): #Helper function
+	#splits the t-m+1 window starts into consecutive ranges [start, end)
+	#the shard for [start, end) is x[start:end+m-1], so consecutive shards overlap in m-1 characters
+	#and every window lies in exactly one shard, hence the merged offsets have no duplicates
+	if shardsize is None:
+		shardsize = max(1 << 16, -(-(t-m+1)//(4*workers))) #a few shards per worker to even out the load
+	return [(start, min(start+shardsize, t-m+1)) for start in range(0, t-m+1, shardsize)]
+
+def shardMatch(q,p,shard,start,base): #runs in a worker process
+	return [start + i for i in modPatternMatch(q,p,shard,base)]
+
+def fileShardMatch(q,p,filename,start,end,base): #runs in a worker process
+	#every worker maps the file itself, so only the file name is sent to it instead of the text
+	with open(filename, 'rb') as f:
+		with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+			shard = data[start:end+len(p)-1] #bytes, so offsets are byte offsets
+	return [start + i for i in modPatternMatch(q,p,shard,base)]
 
+def modPatternMatchParallel(q,p,x,workers = None,shardsize = None,base = 26):
+	#same matches as modPatternMatch(q,p,x), with the shards of x matched in a pool of worker processes
+	m = len(p)
+	t = len(x)
+	if m == 0 or m > t:
+		return []
+	workers = workers or os.cpu_count() or 1
+	result = []
+	with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+		futures = [pool.submit(shardMatch, q, p, x[start:end+m-1], start, base) for start, end in shardBounds(t, m, workers, shardsize)]
+		for future in futures: #shards are collected in order, so the merged list is already sorted
+			result.extend(future.result())
+	return result
+	#O((n+m)logq/workers) time per worker plus the cost of sending the shards to the workers
+
+def modPatternMatchFileParallel(q,p,filename,workers = None,shardsize = None,base = 26):
+	#same as modPatternMatchParallel but the text is read from a memory-mapped file by the workers
+	m = len(p)
+	t = os.path.getsize(filename)
+	if m == 0 or m > t:
+		return []
+	workers = workers or os.cpu_count() or 1
+	result = []
+	with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+		futures = [pool.submit(fileShardMatch, q, p, filename, start, end, base) for start, end in shardBounds(t, m, workers, shardsize)]
+		for future in futures:
+			result.extend(future.result())
+	return result
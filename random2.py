@@ -1,107 +1,725 @@
+import concurrent.futures
+import heapq
+import math
+import mmap
+import numbers
+import os
+from multiprocessing import shared_memory
+from array import array
+
+import instrumentation
+try:
+	import numpy as np
+except ImportError: #numpy only speeds up building a Graph from large arrays
+	np = None
+
+MAXINT = (1 << 63) - 1 #largest value of array('q'), integer capacities are kept in one while maxcap + 1 is at most this
+
 class Heap:
+	#indexed max-heap of nodes keyed by maxcapacity, stored in flat arrays instead of lists of boxed ints
+	#nodes are only inserted once they are discovered, so unreachable nodes never enter the heap
+	__slots__ = ('maxcapacity', 'struct', 'positions', 'size')
+
 	def __init__(self, n, source, maxcap):
-		self.maxcapacity = [-1 for i in range(n)] 
+		if not isinstance(maxcap, int):
+			self.maxcapacity = array('d', [-1])*n
+		elif maxcap <= MAXINT: #integer capacities stay integers
+			self.maxcapacity = array('q', [-1])*n
+		else: #too large for 64 bits, kept as python ints like the capacities of the graph
+			self.maxcapacity = [-1]*n
 		#ith index stores the maxcapacity of the ith numbered node
-		#self.maxcapacity = mylist
-		self.maxcapacity[source] = maxcap
-		self.struct = [i for i in range(n)] #actual structure of the heap
-		self.positions = [i for i in range(n)] #ith index represents the position of the ith node in the heap structure
-		self.size = n
-		self.heap_up(self.positions[source])
-		#O(n)
-	def parent(self, i): #calculates the position of the parent for the given index
-		return max(0, (i-1)//2)
-		#O(1)
-	def left(self, i): #calculates the position of the left child for the given 
-		if 2*i + 1 > self.size - 1:
-			return i
-		return 2*i+1
-		#O(1)
-	def right(self, i): #calculates the position of the right child for the given index
-		if 2*i + 2 > self.size - 1:
-			return i
-		return 2*i+2
-		#O(1)
-	def heap_up(self, k): #This is the standard heap up operation
-		p = self.parent(k) #parent index of the kth index
-		p_node = self.struct[p]
-		k_node = self.struct[k]
-		if self.maxcapacity[p_node] < self.maxcapacity[k_node] :
-			self.positions[k_node], self.positions[p_node] = p, k
-			self.struct[k], self.struct[p] = p_node, k_node
-			self.heap_up(p) #recurse on the parent
+		self.struct = array('l', [0])*n #actual structure of the heap, only the first size entries are used
+		self.positions = array('l', [-1])*n #ith index represents the position of the ith node in the heap structure, -1 if it is not in the heap
+		self.size = 0
+		self.increase(source, maxcap)
+		#O(n) for allocating the arrays, no heap work for the other nodes
+	def increase(self, node, cap): #raises the maxcapacity of node to cap, inserting node if it is not in the heap yet
+		self.maxcapacity[node] = cap
+		k = self.positions[node]
+		if k == -1:
+			k = self.size
+			self.struct[k] = node
+			self.positions[node] = k
+			self.size += 1
+		self.heap_up(k)
+		#O(logn)
+	def heap_up(self, k): #This is the standard heap up operation, done with a loop instead of recursion
+		struct = self.struct
+		positions = self.positions
+		maxcapacity = self.maxcapacity
+		start = k
+		k_node = struct[k]
+		cap = maxcapacity[k_node]
+		while k > 0:
+			p = (k-1) >> 1 #parent index of the kth index
+			p_node = struct[p]
+			if maxcapacity[p_node] >= cap:
+				break
+			struct[k] = p_node #the parent moves down, k_node is only written once at its final place
+			positions[p_node] = k
+			k = p
+		struct[k] = k_node
+		positions[k_node] = k
+		if instrumentation.stats is not None:
+			instrumentation.stats.add("random2.heap.ops")
+			instrumentation.stats.add("random2.heap.swaps", (start+1).bit_length() - (k+1).bit_length()) #levels moved
 		#O(logn)
-	def heap_down(self, k):#This is the standard heap down operation
-		#print("k is ", k)
-		l = self.left(k) #left child index of the kth index
-		r = self.right(k) #right child indez of the kth index
-		k_node = self.struct[k]
-		l_node = self.struct[l]
-		r_node = self.struct[r]
-		max_cap_lr = l
-		if self.maxcapacity[r_node] > self.maxcapacity[l_node]:
-			max_cap_lr = r
-		max_cap_node = self.struct[max_cap_lr]	
-		if self.maxcapacity[max_cap_node] > self.maxcapacity[k_node]:
-			self.positions[k_node], self.positions[max_cap_node] = max_cap_lr, k
-			self.struct[k], self.struct[max_cap_lr] = max_cap_node, k_node
-			self.heap_down(max_cap_lr)
+	def heap_down(self, k): #This is the standard heap down operation, done with a loop instead of recursion
+		struct = self.struct
+		positions = self.positions
+		maxcapacity = self.maxcapacity
+		size = self.size
+		start = k
+		k_node = struct[k]
+		cap = maxcapacity[k_node]
+		while True:
+			l = 2*k + 1 #left child index of the kth index
+			if l >= size:
+				break
+			r = l + 1 #right child index of the kth index
+			child = l
+			if r < size and maxcapacity[struct[r]] > maxcapacity[struct[l]]:
+				child = r
+			c_node = struct[child]
+			if maxcapacity[c_node] <= cap:
+				break
+			struct[k] = c_node #the larger child moves up
+			positions[c_node] = k
+			k = child
+		struct[k] = k_node
+		positions[k_node] = k
+		if instrumentation.stats is not None:
+			instrumentation.stats.add("random2.heap.ops")
+			instrumentation.stats.add("random2.heap.swaps", (k+1).bit_length() - (start+1).bit_length())
 		#O(logn)
-	def build(self): #this is the standard linear time build heap operation
-		for i in range(self.size-1,-1,-1): #heap down from the last element
-			#print("I is ", i)
-			self.heap_down(i) 
-		#O(n)
 	def extract_max(self): #Standard extract max operation
 		top = self.struct[0]
-		bottom = self.struct[self.size-1]
-		self.positions[top], self.positions[bottom] = self.size - 1, 0
-		self.struct[0], self.struct[self.size-1] = bottom, top 
 		self.size -= 1
+		self.positions[top] = -1
 		if self.size > 0:
+			bottom = self.struct[self.size]
+			self.struct[0] = bottom
+			self.positions[bottom] = 0
 			self.heap_down(0)
 		return top
+		#O(logn)
 """def make_adjlist(n, links):
 	adjlist = [[] for i in range(n)]
 	for i in links:
 		adjlist[i[0]].append((i[1], i[2]))
 		adjlist[i[1]].append((i[0], i[2]))
 	return adjlist"""
-def findMaxCapacity(n, links, s, t):
-	maxcap = max(i for i in [links[j][2] for j in range(len(links))])
-	adjlist = [[[],0, -1] for i in range(n)]
-	for i in links:
-		adjlist[i[0]][0].append((i[1], i[2])) #2nd element of the tuple is the link capacity
-		adjlist[i[1]][0].append((i[0], i[2]))
-	print("adjlist is ", adjlist)
-	capacities = Heap(n, s, maxcap +1)
-	#print(capacities.struct)
-	#print(capacities.maxcapacity)
-	while capacities.size > 0:
-		#print("hey")
+class Graph:
+	#undirected network in compressed sparse row form
+	#the links of node u are at indices offsets[u] to offsets[u+1]-1 of neighbors (the other end) and capacities
+	#every link is stored twice, once from each end, in three flat arrays instead of lists of tuples
+	__slots__ = ('n', 'offsets', 'neighbors', 'capacities', 'maxcap')
+
+	def __init__(self, n, offsets, neighbors, capacities):
+		self.n = n
+		self.offsets = offsets #array('q') of n+1 entries
+		self.neighbors = neighbors #array('i') of 2m entries
+		self.capacities = capacities #array('q') or array('d') of 2m entries, a list for integers too large for array('q')
+		self.maxcap = max(capacities) if len(capacities) else 0
+
+	@classmethod
+	def fromLinks(cls, n, links): #from the list of (u, v, capacity) tuples taken by findMaxCapacity
+		return cls.fromArrays(n, [link[0] for link in links], [link[1] for link in links], capacityArray([link[2] for link in links]))
+
+	@classmethod
+	def fromArrays(cls, n, sources, targets, capacities):
+		#the ith link joins sources[i] and targets[i] with capacity capacities[i]
+		#the arguments may be lists, arrays, memoryviews or numpy arrays, capacities are kept as integers unless they are floats
+		if np is not None and len(sources):
+			values = np.asarray(capacities)
+			if values.dtype.kind == 'f' or (values.dtype.kind == 'i' and values.max() < MAXINT): #any other capacities take the exact path below
+				return cls.fromNumpy(n, np.column_stack((np.asarray(sources), np.asarray(targets), values)))
+		capacities = capacityArray(capacities)
+		m = len(sources)
+		offsets = array('q', [0])*(n+1)
+		for u in sources: #degree of every node, shifted by one so the prefix sums below give the offsets
+			offsets[u+1] += 1
+		for v in targets:
+			offsets[v+1] += 1
+		for u in range(n):
+			offsets[u+1] += offsets[u]
+		fill = offsets[:-1] #next free slot of every node
+		neighbors = array('i', [0])*(2*m)
+		caps = capacities[:1]*(2*m) #same storage as capacities, every entry is overwritten below
+		for ends, others in ((sources, targets), (targets, sources)): #same order as the stable sort used by fromNumpy
+			for u, v, c in zip(ends, others, capacities):
+				j = fill[u]
+				neighbors[j] = v
+				caps[j] = c
+				fill[u] = j + 1
+		return cls(n, offsets, neighbors, caps)
+		#O(n+m) time
+
+	@classmethod
+	def fromNumpy(cls, n, edges):
+		#edges is an (m, 3) numpy array of rows (u, v, capacity), the build is done by a counting sort in numpy
+		edges = np.asarray(edges)
+		integral = np.issubdtype(edges.dtype, np.integer)
+		if integral and len(edges) and edges[:, 2].max() >= MAXINT: #no room for maxcap + 1 in int64
+			return cls.fromArrays(n, edges[:, 0].tolist(), edges[:, 1].tolist(), edges[:, 2].tolist())
+		u = edges[:, 0].astype(np.int64)
+		v = edges[:, 1].astype(np.int64)
+		ends = np.concatenate((u, v))
+		order = np.argsort(ends, kind='stable')
+		offsets = np.zeros(n+1, np.int64)
+		np.cumsum(np.bincount(ends, minlength=n), out=offsets[1:])
+		neighbors = np.concatenate((v, u))[order].astype(np.intc)
+		caps = np.concatenate((edges[:, 2], edges[:, 2]))[order].astype(np.int64 if integral else np.float64)
+		return cls(n, array('q', offsets.tobytes()), array('i', neighbors.tobytes()), array('q' if integral else 'd', caps.tobytes()))
+		#O(n + mlogm) time, all of it inside numpy
+
+	@classmethod
+	def fromFile(cls, filename, n = None):
+		#loads a binary edge file of native int64 triples (u, v, capacity) as written by saveLinks
+		#the file is memory-mapped, so the links are not read into Python objects first
+		with open(filename, 'rb') as f:
+			if f.seek(0, 2) == 0:
+				return cls(n or 0, array('q', [0])*((n or 0)+1), array('i'), array('q'))
+			with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+				if np is not None:
+					edges = np.frombuffer(data, dtype=np.int64).reshape(-1, 3)
+					graph = cls.fromNumpy(n if n is not None else int(edges[:, :2].max()) + 1, edges)
+					del edges #the mapping can only be closed once no array refers to it
+					return graph
+				view = memoryview(data).cast('q')
+				try:
+					sources, targets, capacities = view[0::3].tolist(), view[1::3].tolist(), view[2::3].tolist()
+				finally:
+					view.release()
+		if n is None:
+			n = max(max(sources), max(targets)) + 1
+		return cls.fromArrays(n, sources, targets, capacities)
+
+def capacityArray(capacities): #Helper function, the storage Graph uses for a sequence of capacities
+	#array('q') when they are all integers, python or numpy, and fit in it with room for maxcap + 1
+	#array('d') as soon as one is not an integer, and a list of python ints when they are too large for 64 bits
+	if not all(isinstance(c, numbers.Integral) for c in capacities):
+		return array('d', capacities)
+	values = [int(c) for c in capacities]
+	if not values or (min(values) >= -MAXINT and max(values) < MAXINT):
+		return array('q', values)
+	return values
+	#O(m)
+
+def saveLinks(filename, links): #writes links in the binary format read by Graph.fromFile
+	data = array('q')
+	for u, v, cap in links:
+		try:
+			data.extend((u, v, cap))
+		except OverflowError:
+			raise ValueError("capacity %d does not fit in the 64-bit integers of the edge file" % cap) from None
+	with open(filename, 'wb') as f:
+		data.tofile(f)
+
+def maxCapacitySweep(n, links, s, t = -1): #Helper function
+	#the Dijkstra-like sweep from s, stopping as soon as t is extracted from the heap (never when t is -1)
+	#returns the maxcapacity and parent arrays, exact for t and for every node extracted before it
+	graph = links if isinstance(links, Graph) else Graph.fromLinks(n, links)
+	offsets = graph.offsets
+	neighbors = graph.neighbors
+	caps = graph.capacities
+	visited = bytearray(n) #1 once the node has been extracted from the heap
+	parent = array('l', [-1])*n #previous node on the widest path found so far
+	capacities = Heap(n, s, graph.maxcap +1)
+	maxcapacity = capacities.maxcapacity
+	while capacities.size > 0: #the heap only ever holds the discovered nodes that are not visited yet
 		max_node = capacities.extract_max()
-		#print("max_node is ", max_node)
-		adjlist[max_node][1] = 1
-		for j in adjlist[max_node][0]:
-			#print("j is ", j)
-			if adjlist[j[0]][1] == 0:
-				replace_by = min(j[1], capacities.maxcapacity[max_node])
-				replace_this = capacities.maxcapacity[j[0]]
-				if replace_by > replace_this:
-					adjlist[j[0]][2] = max_node
-					capacities.maxcapacity[j[0]] = replace_by
-					capacities.heap_up(capacities.positions[j[0]])
-		#print("yo")
-		#print(max_node, capacities.maxcapacity)
-		#print(capacities.struct)
+		if max_node == t: #its capacity and its whole route are final once it leaves the heap
+			break
+		visited[max_node] = 1
+		node_cap = maxcapacity[max_node]
+		for j in range(offsets[max_node], offsets[max_node+1]):
+			v = neighbors[j]
+			if not visited[v]:
+				replace_by = caps[j] if caps[j] < node_cap else node_cap
+				if replace_by > maxcapacity[v]:
+					parent[v] = max_node
+					capacities.increase(v, replace_by) #inserts v the first time it is reached
+	return maxcapacity, parent
+	#O((n+m)logn) time, the graph takes O(n+m) and the heap and the per node arrays O(n) machine words
+
+def findMaxCapacity(n, links, s, t):
+	#links is either the list of (u, v, capacity) tuples or a Graph, which can be built once and reused for many queries
+	maxcapacity, parent = maxCapacitySweep(n, links, s, t)
 	prev = t
 	result = []
 	while prev != -1:
 		result.append(prev)
-		prev = adjlist[prev][2]
-	#result.append(s)
-	return (capacities.maxcapacity[t], result[::-1])
-print(findMaxCapacity(8, [(0,1,5), (1,2,8), (2,3,6), (3,4,1), (4,5,15), (5,6,2), (6,7,3), (7,0,12), (1,5,7), (1,6,3), (2,5,9), (2,7,11), (3,7,14), (0,4,3), (0,5,4)], 0, 0))
+		prev = parent[prev]
+	return (maxcapacity[t], result[::-1])
+
+def findMaxCapacities(n, links, s):
+	#one sweep for all the targets: returns the arrays (maxcapacity, parent)
+	#maxcapacity[t] is what findMaxCapacity(n, links, s, t) returns for t, -1 if t is unreachable
+	#following parent from t until -1 gives its route backwards
+	return maxCapacitySweep(n, links, s)
+
+sharedGraph = None #the Graph a worker process sees, set up by attachGraph
+sharedBlocks = [] #keeps the shared memory of the worker mapped while the graph is in use
+
+def shareArray(data): #copies an array into a new shared memory block, returns (block, description for attachArray)
+	nbytes = len(data)*data.itemsize
+	block = shared_memory.SharedMemory(create=True, size=max(nbytes, 1)) #a block cannot be empty
+	block.buf[:nbytes] = memoryview(data).cast('B')
+	return block, (block.name, nbytes, data.typecode)
+
+def attachArray(name, nbytes, typecode): #maps a shared block back as a read-only view of the array
+	block = shared_memory.SharedMemory(name=name)
+	sharedBlocks.append(block)
+	return block.buf[:nbytes].toreadonly().cast(typecode)
+
+def attachGraph(n, offsets, neighbors, capacities): #runs once in every worker process
+	global sharedGraph
+	sharedGraph = Graph(n, attachArray(*offsets), attachArray(*neighbors), attachArray(*capacities))
+
+def sweepShared(s): #runs in a worker process
+	return s, maxCapacitySweep(sharedGraph.n, sharedGraph, s)[0]
+
+def findMaxCapacityMatrix(n, links, sources, workers = None, stream = False):
+	#findMaxCapacities for many sources at once, the sweeps run in a pool of worker processes
+	#the three arrays of the Graph are placed in shared memory once and every worker maps them, so links are never pickled
+	#returns the list of maxcapacity rows in the order of sources, or with stream = True
+	#a generator of (source, row) pairs in the order the sweeps finish
+	graph = links if isinstance(links, Graph) else Graph.fromLinks(n, links)
+	if not isinstance(graph.capacities, array):
+		raise ValueError("capacities too large for 64 bits cannot be shared with the workers, use findMaxCapacities for each source")
+	rows = matrixRows(graph, sources, workers or os.cpu_count() or 1)
+	if stream:
+		return rows
+	result = {}
+	for s, row in rows:
+		result[s] = row
+	return [result[s] for s in sources]
+	#O(len(sources)*(n+m)logn/workers) time, the graph is held once in memory however many workers there are
+
+def matrixRows(graph, sources, workers): #Helper function, the generator behind findMaxCapacityMatrix
+	blocks = []
+	try:
+		descriptions = []
+		for data in (graph.offsets, graph.neighbors, graph.capacities):
+			block, description = shareArray(data)
+			blocks.append(block)
+			descriptions.append(description)
+		with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=attachGraph, initargs=(graph.n, *descriptions)) as pool:
+			futures = [pool.submit(sweepShared, s) for s in dict.fromkeys(sources)] #every distinct source is swept once
+			for future in concurrent.futures.as_completed(futures):
+				yield future.result()
+	finally:
+		for block in blocks:
+			block.close()
+			block.unlink()
+
+def sameStorage(caps, values): #Helper function, values in an array of the typecode of caps, or a list when caps is one
+	return array(caps.typecode, values) if isinstance(caps, array) else list(values)
+
+def find(leader, u): #Helper function, union-find root of u with path halving
+	while leader[u] != u:
+		leader[u] = leader[leader[u]]
+		u = leader[u]
+	return u
+	#amortised O(alpha(n)) together with union by size
+
+class CapacityIndex:
+	#answers findMaxCapacity for any pair (s, t) of the same network without a new sweep
+	#the widest path between two nodes can always be taken along a maximum spanning tree, so the tree is built once (Kruskal)
+	#and the minimum capacity on the tree path is read off binary lifting tables: up[k][u] is the 2**k-th ancestor of u
+	#and upcap[k][u] the smallest capacity on the way there
+	__slots__ = ('n', 'maxcap', 'leader', 'depth', 'up', 'upcap')
+
+	def __init__(self, n, links):
+		graph = links if isinstance(links, Graph) else Graph.fromLinks(n, links)
+		offsets = graph.offsets
+		neighbors = graph.neighbors
+		caps = graph.capacities
+		self.n = n
+		self.maxcap = graph.maxcap
+
+		#Kruskal on the links in decreasing order of capacity, each link is taken from its smaller end
+		ends = [(u, neighbors[j], j) for u in range(n) for j in range(offsets[u], offsets[u+1]) if neighbors[j] > u]
+		ends.sort(key=lambda e: caps[e[2]], reverse=True)
+		leader = array('l', range(n))
+		size = array('l', [1])*n
+		tree = [[] for i in range(n)]
+		for u, v, j in ends:
+			a = find(leader, u)
+			b = find(leader, v)
+			if a != b:
+				if size[a] < size[b]:
+					a, b = b, a
+				leader[b] = a
+				size[a] += size[b]
+				tree[u].append((v, caps[j]))
+				tree[v].append((u, caps[j]))
+		self.leader = leader #two nodes are connected exactly when they have the same root
+
+		#root every tree of the forest and record parent, depth and the capacity of the link to the parent
+		top = graph.maxcap + 1 #larger than any capacity, used above the roots
+		depth = array('l', [-1])*n
+		parent = array('l', range(n))
+		parentcap = sameStorage(caps, [top])*n
+		for root in range(n):
+			if depth[root] != -1:
+				continue
+			depth[root] = 0
+			stack = [root]
+			while stack:
+				u = stack.pop()
+				for v, cap in tree[u]:
+					if depth[v] == -1:
+						depth[v] = depth[u] + 1
+						parent[v] = u
+						parentcap[v] = cap
+						stack.append(v)
+		self.depth = depth
+
+		self.up = [parent]
+		self.upcap = [parentcap]
+		for k in range(1, max(1, max(depth) if n else 0).bit_length()):
+			prev = self.up[-1]
+			prevcap = self.upcap[-1]
+			self.up.append(array('l', [prev[prev[u]] for u in range(n)]))
+			self.upcap.append(sameStorage(caps, [min(prevcap[u], prevcap[prev[u]]) for u in range(n)]))
+		#O(mlogm) for the sort and O(nlogn) time and space for the tables
+
+	def capacity(self, s, t): #the capacity that findMaxCapacity(n, links, s, t) returns, in O(logn)
+		if s == t:
+			return self.maxcap + 1
+		if find(self.leader, s) != find(self.leader, t):
+			return -1
+		depth = self.depth
+		up = self.up
+		upcap = self.upcap
+		best = self.maxcap + 1
+		if depth[s] < depth[t]:
+			s, t = t, s
+		diff = depth[s] - depth[t]
+		k = 0
+		while diff: #lift s to the depth of t
+			if diff & 1:
+				best = min(best, upcap[k][s])
+				s = up[k][s]
+			diff >>= 1
+			k += 1
+		if s == t:
+			return best
+		for k in range(len(up)-1, -1, -1): #lift both to just below their lowest common ancestor
+			if up[k][s] != up[k][t]:
+				best = min(best, upcap[k][s], upcap[k][t])
+				s = up[k][s]
+				t = up[k][t]
+		return min(best, upcap[0][s], upcap[0][t])
+
+	def query(self, s, t): #same (capacity, route) pair as findMaxCapacity, the route is walked along the tree
+		cap = self.capacity(s, t)
+		if cap == -1:
+			return (cap, [t])
+		parent = self.up[0]
+		depth = self.depth
+		head = [] #s up to the common ancestor
+		tail = [] #t up to the common ancestor, reversed at the end
+		while depth[s] > depth[t]:
+			head.append(s)
+			s = parent[s]
+		while depth[t] > depth[s]:
+			tail.append(t)
+			t = parent[t]
+		while s != t:
+			head.append(s)
+			tail.append(t)
+			s = parent[s]
+			t = parent[t]
+		head.append(s)
+		return (cap, head + tail[::-1])
+		#O(logn) for the capacity and O(length of the route) for the route
+
+class DynamicCapacityIndex:
+	#maximum spanning forest of a network whose links keep changing, kept up to date link by link
+	#every link gets an id: the position in the initial links list, or the value returned by addLink
+	#adding a link either joins two trees or replaces the weakest link on the tree path between its ends (cycle property),
+	#removing a tree link reconnects the two halves by the strongest link crossing between them (cut property)
+	#so the forest stays a maximum spanning forest and the tree path between two nodes is a widest path
+	#every tree is rooted, parent pointers give tree paths by climbing from both ends, so adding a link only walks the cycle it closes
+	#removing a tree link searches both halves at the same pace and stops with the smaller one, so its cost is that of the smaller half
+	#for the watched sources the capacity to every node is stored and only the half of a tree whose route changed is refreshed
+
+	def __init__(self, n, links = (), watched = ()):
+		self.n = n
+		self.links = {} #id -> [u, v, capacity]
+		self.incident = [set() for i in range(n)] #ids of all the links at each node
+		self.tree = [{} for i in range(n)] #neighbour -> id of the tree link to it
+		self.parent = array('l', [-1])*n #parent of each node in its rooted tree, -1 for a root
+		self.parentlink = array('l', [-1])*n #id of the tree link to the parent
+		self.nextid = len(links)
+		self.watched = {} #source -> list of capacities to every node, -1 if unreachable
+		self.capcount = {} #capacity -> number of links with it
+		self.caps = [] #heap of the negated capacities, entries whose count dropped to 0 are removed lazily by maxcap
+		leader = array('l', range(n))
+		for linkid in sorted(range(len(links)), key=lambda i: links[i][2], reverse=True): #Kruskal for the initial forest
+			u, v, cap = links[linkid]
+			self.remember(linkid, u, v, cap)
+			a = find(leader, u)
+			b = find(leader, v)
+			if a != b:
+				leader[a] = b
+				self.tree[u][v] = linkid
+				self.tree[v][u] = linkid
+		seen = bytearray(n)
+		for r in range(n): #roots every tree of the initial forest
+			if seen[r]:
+				continue
+			seen[r] = 1
+			stack = [r]
+			while stack:
+				u = stack.pop()
+				for v, linkid in self.tree[u].items():
+					if not seen[v]:
+						seen[v] = 1
+						self.parent[v] = u
+						self.parentlink[v] = linkid
+						stack.append(v)
+		for source in watched:
+			self.watch(source)
+		#O(mlogm) time
+
+	def remember(self, linkid, u, v, cap): #records a link, tree or not
+		self.links[linkid] = [u, v, cap]
+		self.incident[u].add(linkid)
+		self.incident[v].add(linkid)
+		if not self.capcount.get(cap):
+			heapq.heappush(self.caps, -cap)
+		self.capcount[cap] = self.capcount.get(cap, 0) + 1
+
+	def forget(self, linkid):
+		u, v, cap = self.links.pop(linkid)
+		self.incident[u].discard(linkid)
+		self.incident[v].discard(linkid)
+		self.capcount[cap] -= 1
+
+	def root(self, u): #root of the tree of u
+		parent = self.parent
+		while parent[u] != -1:
+			u = parent[u]
+		return u
+		#O(depth of u)
+
+	def evert(self, u): #makes u the root of its tree by turning round the links on the way from u to the old root
+		parent = self.parent
+		parentlink = self.parentlink
+		previous = -1
+		previouslink = -1
+		while u != -1:
+			up = parent[u]
+			uplink = parentlink[u]
+			parent[u] = previous
+			parentlink[u] = previouslink
+			previous = u
+			previouslink = uplink
+			u = up
+		#O(depth of u)
+
+	def attach(self, linkid, below = None): #puts a link joining two trees into the forest, the tree of below (default the first end) hangs from the other end
+		u, v, cap = self.links[linkid]
+		if below == v:
+			u, v = v, u
+		self.tree[u][v] = linkid
+		self.tree[v][u] = linkid
+		self.evert(u)
+		self.parent[u] = v
+		self.parentlink[u] = linkid
+		#O(depth of u)
+
+	def detach(self, linkid): #takes a link out of the forest, the end below it becomes a root
+		u, v, cap = self.links[linkid]
+		del self.tree[u][v]
+		del self.tree[v][u]
+		if self.parentlink[u] == linkid:
+			self.parent[u] = -1
+			self.parentlink[u] = -1
+		else:
+			self.parent[v] = -1
+			self.parentlink[v] = -1
+		#O(1)
+
+	def treePath(self, u, v): #nodes and link ids on the tree path from u to v, None if they are in different trees
+		#u and v climb in turns, the first node that one of them reaches after the other is their lowest common ancestor
+		parent = self.parent
+		parentlink = self.parentlink
+		seen = ({u: (-1, -1)}, {v: (-1, -1)}) #node -> (the node below it on the climb, the link between them)
+		ends = [u, v]
+		meet = u if u == v else None
+		while meet is None and (ends[0] != -1 or ends[1] != -1):
+			for side in (0, 1):
+				a = ends[side]
+				if a == -1: #this end is already at its root
+					continue
+				b = parent[a]
+				ends[side] = b
+				if b == -1:
+					continue
+				seen[side][b] = (a, parentlink[a])
+				if b in seen[1-side]:
+					meet = b
+					break
+		if meet is None:
+			return None
+		nodes = []
+		ids = []
+		node = meet
+		while True: #from the meeting node down to u
+			nodes.append(node)
+			node, linkid = seen[0][node]
+			if node == -1:
+				break
+			ids.append(linkid)
+		nodes.reverse()
+		ids.reverse()
+		node = meet
+		while True: #and down to v
+			node, linkid = seen[1][node]
+			if node == -1:
+				break
+			nodes.append(node)
+			ids.append(linkid)
+		return nodes, ids
+		#O(length of the path) when u and v are in the same tree, O(depth of u + depth of v) otherwise
+
+	def smallerHalf(self, a, b): #nodes of the smaller of the trees of a and b
+		#both trees are searched one node at a time, so the search stops after twice the size of the smaller one
+		seen = ({a}, {b})
+		stacks = ([a], [b])
+		while True:
+			for side in (0, 1):
+				stack = stacks[side]
+				if not stack:
+					return seen[side]
+				u = stack.pop()
+				for v in self.tree[u]:
+					if v not in seen[side]:
+						seen[side].add(v)
+						stack.append(v)
+		#O(size of the smaller tree)
+
+	def spread(self, values, node, previous, cap): #recomputes the values of the part of the tree hanging from node, entered from previous with capacity cap
+		#with cap = -1 every value of that part becomes -1, i.e. unreachable
+		values[node] = cap
+		stack = [(node, previous)]
+		while stack:
+			u, before = stack.pop()
+			for v, linkid in self.tree[u].items():
+				if v != before:
+					values[v] = min(values[u], self.links[linkid][2])
+					stack.append((v, u))
+		#O(size of that part)
+
+	def joined(self, linkid): #refreshes the watched sources after linkid joined two trees
+		u, v, cap = self.links[linkid]
+		for values in self.watched.values():
+			if values[u] != -1: #the source is on the side of u, everything on the side of v is now reached through the link
+				self.spread(values, v, u, min(values[u], cap))
+			elif values[v] != -1:
+				self.spread(values, u, v, min(values[v], cap))
+
+	def addLink(self, u, v, cap, linkid = None):
+		if linkid is None:
+			linkid = self.nextid
+			self.nextid += 1
+		self.remember(linkid, u, v, cap)
+		if u == v: #a loop never lies on a widest path
+			return linkid
+		path = self.treePath(u, v)
+		if path is None: #u and v were in different trees
+			self.attach(linkid)
+			self.joined(linkid)
+			return linkid
+		weakest = min(path[1], key=lambda i: self.links[i][2])
+		if self.links[weakest][2] < cap: #the new link is a better way around the weakest link of the cycle
+			self.detach(weakest)
+			#which half each watched source of this tree ends up in, the sources in other trees keep values[u] == -1
+			top = self.root(u)
+			sides = [(values, self.root(source) == top) for source, values in self.watched.items() if values[u] != -1]
+			self.attach(linkid)
+			for values, onu in sides: #only the half without the source changed its routes, it is now entered through the new link
+				if onu:
+					self.spread(values, v, u, min(values[u], cap))
+				else:
+					self.spread(values, u, v, min(values[v], cap))
+		return linkid
+		#O(length of the cycle) time, plus O(depth) and the refreshed half for every watched source in the tree
+
+	def removeLink(self, linkid):
+		u, v, cap = self.links[linkid]
+		if self.tree[u].get(v) != linkid: #not a tree link, no route used it
+			self.forget(linkid)
+			return
+		self.detach(linkid)
+		self.forget(linkid)
+		small = self.smallerHalf(u, v)
+		best = None #strongest link between the two halves, any link leaving the smaller half goes to the other one
+		for a in small:
+			for candidate in self.incident[a]:
+				x, y, c = self.links[candidate]
+				if (x not in small or y not in small) and (best is None or c > self.links[best][2]):
+					best = candidate
+		if best is not None:
+			x, y, c = self.links[best]
+			self.attach(best, x if x in small else y) #the smaller half is the one that gets rerooted
+		for source, values in self.watched.items():
+			if values[u] == -1: #the source is in another tree
+				continue
+			if best is None: #the half without the source is cut off
+				outer = v if (u in small) == (source in small) else u
+				self.spread(values, outer, -1, -1)
+			else: #the half without the source is now entered through best
+				inner, outer = (x, y) if (x in small) == (source in small) else (y, x)
+				self.spread(values, outer, inner, min(values[inner], c))
+		#O(size of the smaller half + links at it) time, plus the refreshed half for every watched source in the tree
+
+	def changeCapacity(self, linkid, cap): #a change is a removal followed by adding the link again under the same id
+		u, v = self.links[linkid][:2]
+		self.removeLink(linkid)
+		self.addLink(u, v, cap, linkid)
+
+	def maxcap(self): #largest capacity of any link, only needed for the answer when s == t
+		caps = self.caps
+		while caps and not self.capcount.get(-caps[0]): #capacities no link has any more
+			heapq.heappop(caps)
+		return -caps[0] if caps else 0
+		#O(logm) amortized
+
+	def watch(self, source): #starts keeping the capacities from source to every node up to date
+		self.watched[source] = self.spreadFrom(source)
+
+	def unwatch(self, source):
+		del self.watched[source]
+
+	def capacities(self, source): #capacity from source to every node, as findMaxCapacity would give it for each target
+		values = list(self.watched[source]) if source in self.watched else self.spreadFrom(source)
+		values[source] = self.maxcap() + 1
+		return values
+
+	def spreadFrom(self, source): #capacities from source along the forest, the source itself is infinite
+		values = [-1]*self.n
+		self.spread(values, source, -1, math.inf)
+		return values
+
+	def query(self, s, t): #same (capacity, route) pair as findMaxCapacity
+		if s == t:
+			return (self.maxcap() + 1, [s])
+		path = self.treePath(s, t)
+		if path is None:
+			return (-1, [t])
+		if s in self.watched:
+			return (self.watched[s][t], path[0])
+		return (min(self.links[linkid][2] for linkid in path[1]), path[0])
+		#O(length of the path) when s and t are connected
+
+if __name__ == "__main__":
+	print(findMaxCapacity(8, [(0,1,5), (1,2,8), (2,3,6), (3,4,1), (4,5,15), (5,6,2), (6,7,3), (7,0,12), (1,5,7), (1,6,3), (2,5,9), (2,7,11), (3,7,14), (0,4,3), (0,5,4)], 0, 0))
 '''
 class Heap:
     def __init__(self, n, source, maxcap):
@@ -0,0 +1,112 @@
+import random
+
+import pytest
+
+import collisions
+
+def bruteCollisions(M, x, v, m, T):
+	#listCollisions without the heap, the next collision is the smallest (time, block) over all pairs
+	x = list(x)
+	v = list(v)
+	n = len(M)
+	times = [collisions.collision_time(0, i, M, x, v, T) for i in range(n-1)]
+	result = []
+	while len(result) < m and n > 1:
+		k = min(range(n-1), key=lambda i: (times[i], i))
+		t = times[k]
+		if t > T:
+			break
+		point = x[k] + v[k]*t
+		vel = collisions.velocities(M, v, x, k)
+		x[k] += t*(v[k] - vel[0])
+		x[k+1] += t*(v[k+1] - vel[1])
+		v[k], v[k+1] = vel
+		for i in (k-1, k, k+1):
+			if 0 <= i < n-1:
+				times[i] = collisions.collision_time(t, i, M, x, v, T)
+		result.append((round(t, 4), k, round(point, 4)))
+	return result
+
+def randomSystem(rng): #small systems with equal masses and integer velocities so that ties happen
+	n = rng.randint(2, 30)
+	M = [rng.choice([1.0, rng.uniform(0.1, 10)]) for i in range(n)]
+	x = [float(a) for a in sorted(rng.sample(range(200), n))]
+	v = [float(rng.randint(-3, 3)) if rng.random() < 0.5 else rng.uniform(-5, 5) for i in range(n)]
+	return M, x, v, rng.randint(1, 300), rng.uniform(1, 100)
+
+def test_event_order_matches_brute_force():
+	rng = random.Random(0)
+	for case in range(500):
+		M, x, v, m, T = randomSystem(rng)
+		assert collisions.listCollisions(M, x, v, m, T) == bruteCollisions(M, x, v, m, T)
+
+def test_times_never_go_backwards():
+	rng = random.Random(1)
+	for case in range(500):
+		result = collisions.listCollisions(*randomSystem(rng))
+		assert all(a[0] <= b[0] for a, b in zip(result, result[1:]))
+
+def test_simulator_matches_listCollisions_and_keeps_inputs(tmp_path):
+	rng = random.Random(2)
+	for case in range(50):
+		M, x, v, m, T = randomSystem(rng)
+		copies = (list(M), list(x), list(v))
+		expected = collisions.listCollisions(M, x, v, m, T)
+		simulator = collisions.CollisionSimulator(M, x, v, m, T)
+		half = [next(simulator) for i in range(len(expected)//2)]
+		simulator.save(tmp_path/"checkpoint")
+		resumed = collisions.CollisionSimulator.load(tmp_path/"checkpoint")
+		assert half + list(resumed) == expected
+		assert (M, x, v) == copies
+
+def test_no_collisions():
+	assert collisions.listCollisions([1.0], [0.0], [1.0], 10, 10) == []
+	assert collisions.listCollisions([1.0, 1.0], [0.0, 1.0], [0.0, 1.0], 10, 10) == []
+
+def test_stateAt_matches_replay():
+	rng = random.Random(3)
+	for case in range(100):
+		M, x, v, m, T = randomSystem(rng)
+		simulator = collisions.CollisionSimulator(M, x, v, m, T, history=True)
+		list(simulator)
+		n = len(M)
+		for t in [rng.uniform(0, simulator.horizon()) for i in range(3)]:
+			replay = collisions.CollisionSimulator(M, x, v, m, T) #stopped at the last collision up to t
+			while replay.number < m and replay.minheap.view_min_time() <= t:
+				next(replay)
+			positions, velocities = simulator.stateAt(t)
+			assert velocities == replay.v
+			assert all(abs(a - (b + c*t)) < 1e-9 for a, b, c in zip(positions, replay.x, replay.v))
+			assert simulator.stateAt(t, 1, n) == (positions[1:], velocities[1:])
+
+def test_stateAt_needs_history_and_a_time_in_range():
+	simulator = collisions.CollisionSimulator([1.0, 1.0], [0.0, 1.0], [1.0, 0.0], 10, 5)
+	with pytest.raises(ValueError):
+		simulator.stateAt(0)
+	simulator = collisions.CollisionSimulator([1.0, 1.0], [0.0, 1.0], [1.0, 0.0], 10, 5, history=True)
+	list(simulator)
+	assert simulator.stateAt(2) == ([1.0, 2.0], [0.0, 1.0])
+	with pytest.raises(ValueError):
+		simulator.stateAt(6)
+
+def test_ensemble_matches_listCollisions():
+	np = pytest.importorskip("numpy")
+	rng = random.Random(4)
+	for n in (1, 2, 3, 10, 25):
+		for m, T in ((10**6, 1e9), (7, 1e9), (10**6, 5.0)):
+			batch = 40
+			M = [[rng.uniform(1, 10) for i in range(n)] for b in range(batch)]
+			x = [sorted(rng.uniform(0, 20) for i in range(n)) for b in range(batch)]
+			v = [[rng.choice([rng.uniform(-2, 2), 1.0, -1.0]) for i in range(n)] for b in range(batch)] #repeated velocities give ties
+			system, time, block, point = collisions.listCollisionsEnsemble(M, x, v, m, T)
+			for b in range(batch):
+				rows = system == b
+				assert list(zip(time[rows].tolist(), block[rows].tolist(), point[rows].tolist())) == collisions.listCollisions(M[b], x[b], v[b], m, T)
+
+def test_huge_horizon_gives_no_phantom_collisions():
+	#with T above 2**53 T+1 == T, pairs that never collide must still never be reported
+	rng = random.Random(5)
+	M = [rng.uniform(1, 10) for i in range(200)]
+	x = [float(i) for i in range(200)]
+	v = [rng.uniform(-1, 1) for i in range(200)]
+	assert collisions.listCollisions(M, x, v, 10**6, 1e18) == collisions.listCollisions(M, x, v, 10**6, 1e12)
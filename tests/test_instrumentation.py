@@ -0,0 +1,23 @@
+import collisions
+import instrumentation
+import patternMatching
+import random2
+
+def test_hooks_fill_the_snapshot_counters():
+	stats = instrumentation.enable()
+	try:
+		assert instrumentation.stats is stats
+		patternMatching.modPatternMatch(2**61 - 1, "AB", "CABBABCAB")
+		patternMatching.verifyMatches("AB", "CABBABCAB", [1, 2, 4]) #2 is a candidate that does not match
+		random2.findMaxCapacity(8, [(0,1,5), (1,2,8), (2,3,6), (3,4,1), (4,5,15), (5,6,2), (6,7,3), (7,0,12), (1,5,7), (1,6,3), (2,5,9), (2,7,11), (3,7,14), (0,4,3), (0,5,4)], 0, 3)
+		collisions.listCollisions([1, 2, 3, 4, 5], [0, 1, 2, 3, 4], [4, 3, -1, 2, -5], 10, 100)
+	finally:
+		old = instrumentation.disable()
+	assert old is stats
+	assert instrumentation.stats is None
+	for name in ("hash.windows", "hash.candidates", "hash.verified", "hash.collisions", "hash.checked",
+			"random2.heap.ops", "random2.heap.swaps", "collisions.heap.ops", "collisions.heap.swaps", "collisions.events"):
+		assert stats.counters.get(name, 0) > 0, name
+	snapshot = stats.snapshot()
+	assert snapshot["false positive rate"] == stats.counters["hash.collisions"]/stats.counters["hash.checked"]
+	assert snapshot["random2 swaps per operation"] > 0 and snapshot["collisions swaps per operation"] > 0
@@ -0,0 +1,152 @@
+import io
+import random
+
+import pytest
+
+import patternMatching
+
+Q = 2**61 - 1 #a large fixed prime, f of the short patterns below is less than Q so a hash match is a real match
+
+def randomWildcard(rng, m): #a pattern of m positions mixing literals, '?' and classes, with the positions themselves
+	text = []
+	positions = []
+	for i in range(m):
+		kind = rng.random()
+		if kind < 0.25:
+			text.append('?')
+			positions.append(None)
+		elif kind < 0.5:
+			members = rng.sample('ABC', rng.randint(1, 3))
+			text.append('[' + ''.join(members) + ']')
+			positions.append(set(members))
+		else:
+			c = rng.choice('ABC')
+			text.append(c)
+			positions.append({c})
+	return ''.join(text), positions
+
+def bruteMatches(positions, x): #every offset where each character of x is allowed by its position, None allows anything
+	m = len(positions)
+	return [i for i in range(len(x) - m + 1) if all(c is None or x[i+j] in c for j, c in enumerate(positions))]
+
+def randomText(rng, longest = 40):
+	return ''.join(rng.choice('ABC') for i in range(rng.randint(0, longest)))
+
+def test_wildcard_matches_brute_force():
+	rng = random.Random(0)
+	for case in range(2000):
+		p, positions = randomWildcard(rng, rng.randint(1, 8))
+		x = randomText(rng)
+		expected = bruteMatches(positions, x)
+		assert patternMatching.modPatternMatchWildcard(Q, p, x) == expected
+		assert list(patternMatching.modPatternMatchWildcardStream(Q, p, x)) == expected
+		assert patternMatching.modPatternMatchWildcard(Q, p.encode(), x.encode(), 26) == expected
+
+def test_patterns_without_masks_match_exactly():
+	rng = random.Random(1)
+	for case in range(500):
+		p = ''.join(rng.choice('ABC') for i in range(rng.randint(1, 8)))
+		x = randomText(rng)
+		expected = bruteMatches([{c} for c in p], x)
+		assert patternMatching.modPatternMatch(Q, p, x) == expected
+		assert patternMatching.modPatternMatchWildcard(Q, p, x) == expected
+		single = p[:len(p)//2] + '?' + p[len(p)//2 + 1:] #the one-'?' patterns the original wildcard matcher handled
+		assert patternMatching.modPatternMatchWildcard(Q, single, x) == bruteMatches([None if c == '?' else {c} for c in single], x)
+
+def test_unterminated_class():
+	with pytest.raises(ValueError):
+		patternMatching.modPatternMatchWildcard(Q, 'A[BC', 'ABC')
+
+def randomChunks(rng, x): #x cut at random places, with chunks of size 1 and empty chunks among them
+	chunks = []
+	i = 0
+	while i < len(x):
+		size = rng.choice([0, 1, 1, 2, 3, rng.randint(1, 10)])
+		chunks.append(x[i:i+size])
+		i += size
+	if rng.random() < 0.5:
+		chunks.insert(rng.randint(0, len(chunks)), x[:0])
+	return chunks
+
+def test_streams_carry_across_chunk_boundaries():
+	rng = random.Random(2)
+	for case in range(1000):
+		p, positions = randomWildcard(rng, rng.randint(1, 8))
+		x = randomText(rng)
+		expected = bruteMatches(positions, x)
+		assert list(patternMatching.modPatternMatchWildcardStream(Q, p, iter(randomChunks(rng, x)))) == expected
+		assert list(patternMatching.modPatternMatchWildcardStream(Q, p.encode(), randomChunks(rng, x.encode()))) == expected
+		exact = p.replace('?', 'A').replace('[', '').replace(']', '')[:3] #some literal pattern
+		assert list(patternMatching.modPatternMatchStream(Q, exact, randomChunks(rng, x))) == patternMatching.modPatternMatch(Q, exact, x)
+
+def test_streams_from_file_objects():
+	rng = random.Random(3)
+	x = ''.join(rng.choice('ABC') for i in range(150000)) #more than two reads of textChunks
+	p = 'AB?CA[BC]'
+	expected = patternMatching.modPatternMatchWildcard(Q, p, x)
+	assert list(patternMatching.modPatternMatchWildcardStream(Q, p, io.StringIO(x))) == expected
+	assert list(patternMatching.modPatternMatchWildcardStream(Q, p, io.BytesIO(x.encode()))) == expected
+	assert list(patternMatching.modPatternMatchStream(Q, 'ABCA', io.StringIO(x))) == patternMatching.modPatternMatch(Q, 'ABCA', x)
+
+def test_latin1_and_wider_chunks_mixed():
+	#a chunk below 256 becomes bytes and a wider one an array of code points, the carry between them changes type
+	rng = random.Random(4)
+	wide = 0x110000
+	for case in range(300):
+		x = ''.join(rng.choice('ABĀ') for i in range(rng.randint(0, 30)))
+		p = ''.join(rng.choice(['A', 'B', 'Ā', '?']) for i in range(rng.randint(1, 5)))
+		expected = bruteMatches([None if c == '?' else {c} for c in p], x)
+		assert list(patternMatching.modPatternMatchWildcardStream(Q, p, randomChunks(rng, x), wide)) == expected
+		literal = p.replace('?', 'A')
+		assert list(patternMatching.modPatternMatchStream(Q, literal, randomChunks(rng, x), wide)) == patternMatching.modPatternMatch(Q, literal, x, wide)
+
+def test_mmap_matches_modPatternMatch(tmp_path):
+	pytest.importorskip("numpy")
+	q = next(n for n in range(patternMatching.MAXNUMPYPRIME, 0, -1) if patternMatching.isPrime(n)) #largest prime numpy can use
+	rng = random.Random(5)
+	filename = tmp_path/"text"
+	for case in range(200):
+		x = randomText(rng, 60).encode()
+		p = ''.join(rng.choice('ABC') for i in range(rng.randint(1, 7)))
+		filename.write_bytes(x)
+		expected = patternMatching.modPatternMatch(q, p, x)
+		for blocksize in (1, 2, max(1, len(p) - 1), len(p), len(p) + 1, 1 << 20): #blocks shorter and longer than m
+			assert patternMatching.modPatternMatchMmap(q, p, filename, blocksize) == expected
+
+def test_mmap_empty_and_short_files(tmp_path):
+	pytest.importorskip("numpy")
+	filename = tmp_path/"text"
+	for x in (b'', b'A', b'AB'):
+		filename.write_bytes(x)
+		assert patternMatching.modPatternMatchMmap(101, 'ABC', filename) == [] == patternMatching.modPatternMatch(101, 'ABC', x)
+	filename.write_bytes(b'AB')
+	assert patternMatching.modPatternMatchMmap(101, 'AB', filename) == [0]
+
+def test_multi_matches_each_pattern_alone():
+	rng = random.Random(6)
+	for case in range(500):
+		x = randomText(rng)
+		patterns = [''.join(rng.choice('ABC') for i in range(rng.randint(0, 6))) for j in range(rng.randint(1, 6))]
+		patterns += rng.sample(patterns, rng.randint(0, len(patterns))) #duplicates get their own list each
+		assert patternMatching.modPatternMatchMulti(Q, patterns, x) == [patternMatching.modPatternMatch(Q, p, x) for p in patterns]
+
+def test_batch_matches_every_record_alone():
+	rng = random.Random(7)
+	for case in range(300):
+		records = [randomText(rng, 12) for r in range(rng.randint(0, 8))]
+		text = ''.join(records)
+		offsets = [0]
+		for record in records:
+			offsets.append(offsets[-1] + len(record))
+		p = ''.join(rng.choice('ABC') for i in range(rng.randint(1, 4)))
+		w, positions = randomWildcard(rng, rng.randint(1, 4))
+		for pattern, expected in ((patternMatching.compiledPattern(p, Q), [bruteMatches([{c} for c in p], record) for record in records]),
+				(patternMatching.compiledPattern(w, Q, True), [bruteMatches(positions, record) for record in records])):
+			pairs = [(r, i) for r, found in enumerate(expected) for i in found]
+			ids, found = pattern.findbatch(records)
+			assert list(zip(ids, found)) == pairs
+			ids, found = pattern.findbatch(text, offsets)
+			assert list(zip(ids, found)) == pairs
+			#a match of the joined text that straddles two records is never reported
+			assert all(i + pattern.m <= len(records[r]) for r, i in pairs)
+		assert patternMatching.modPatternMatchBatch(Q, p, records) == patternMatching.compiledPattern(p, Q).findbatch(records)
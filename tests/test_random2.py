@@ -0,0 +1,142 @@
+import random
+
+import pytest
+
+import random2
+
+def widest(links, route): #capacity of the best link between each pair of consecutive nodes of a route, and the smallest of those
+	best = {}
+	for u, v, c in links:
+		best[(u, v)] = max(best.get((u, v), -1), c)
+		best[(v, u)] = max(best.get((v, u), -1), c)
+	return min(best[(route[i], route[i+1])] for i in range(len(route) - 1))
+
+def test_dynamic_index_matches_findMaxCapacity():
+	rng = random.Random(0)
+	for case in range(60):
+		n = rng.randint(1, 10)
+		links = [(rng.randrange(n), rng.randrange(n), rng.randint(1, 6)) for i in range(rng.randint(0, 20))]
+		index = random2.DynamicCapacityIndex(n, links, rng.sample(range(n), min(n, 2)))
+		live = dict(enumerate(links))
+		for step in range(20):
+			op = rng.random()
+			if op < 0.4:
+				link = (rng.randrange(n), rng.randrange(n), rng.randint(1, 6))
+				live[index.addLink(*link)] = link
+			elif op < 0.7 and live:
+				linkid = rng.choice(list(live))
+				index.removeLink(linkid)
+				del live[linkid]
+			elif live:
+				linkid = rng.choice(list(live))
+				cap = rng.randint(1, 6)
+				index.changeCapacity(linkid, cap)
+				live[linkid] = live[linkid][:2] + (cap,)
+			current = list(live.values())
+			for s in range(n):
+				expected = [random2.findMaxCapacity(n, current, s, t)[0] for t in range(n)]
+				if s in index.watched:
+					assert index.capacities(s) == expected
+				for t in range(n):
+					cap, route = index.query(s, t)
+					assert cap == expected[t]
+					if cap != -1 and s != t:
+						assert route[0] == s and route[-1] == t and widest(current, route) == cap
+
+def test_capacity_index_matches_findMaxCapacity():
+	rng = random.Random(1)
+	for case in range(150):
+		n = rng.randint(1, 12)
+		links = [(rng.randrange(n), rng.randrange(n), rng.randint(1, 9)) for i in range(rng.randint(0, n + 5))] #few links, so many pairs are disconnected
+		index = random2.CapacityIndex(n, links)
+		for s in range(n):
+			for t in range(n): #s == t included
+				expected = random2.findMaxCapacity(n, links, s, t)[0]
+				assert index.capacity(s, t) == expected
+				cap, route = index.query(s, t)
+				assert cap == expected
+				if cap == -1:
+					assert route == [t]
+				elif s != t:
+					assert route[0] == s and route[-1] == t and widest(links, route) == cap
+
+def layout(graph):
+	return graph.n, list(graph.offsets), list(graph.neighbors), list(graph.capacities), graph.maxcap
+
+def test_numpy_and_pure_graphs_have_the_same_layout(monkeypatch):
+	np = pytest.importorskip("numpy")
+	rng = random.Random(2)
+	for case in range(40):
+		n = rng.randint(1, 10)
+		links = [(rng.randrange(n), rng.randrange(n), rng.choice((rng.randint(1, 9), rng.random()))) for i in range(rng.randint(0, 15))]
+		if case % 2: #integers only, so both builds keep them in array('q')
+			links = [(u, v, rng.randint(1, 9)) for u, v, c in links]
+		sources, targets, capacities = [link[0] for link in links], [link[1] for link in links], [link[2] for link in links]
+		fast = random2.Graph.fromArrays(n, sources, targets, capacities)
+		monkeypatch.setattr(random2, "np", None)
+		pure = random2.Graph.fromArrays(n, sources, targets, capacities)
+		monkeypatch.setattr(random2, "np", np)
+		assert layout(fast) == layout(pure)
+		assert fast.capacities.typecode == pure.capacities.typecode
+
+def test_integer_capacities_stay_exact():
+	np = pytest.importorskip("numpy")
+	assert random2.findMaxCapacity(3, [(0,1,np.int64(2**60+1)),(1,2,np.int64(2**60+3))], 0, 2) == (2**60+1, [0, 1, 2])
+	links = [(0,1,2**70+1), (1,2,2**70+3), (2,3,2**63-1)]
+	assert random2.findMaxCapacity(4, links, 0, 2) == (2**70+1, [0, 1, 2])
+	assert random2.findMaxCapacity(4, links, 0, 3) == (2**63-1, [0, 1, 2, 3])
+	index = random2.CapacityIndex(4, links)
+	assert [index.capacity(0, t) for t in range(4)] == [2**70+4, 2**70+1, 2**70+1, 2**63-1]
+	with pytest.raises(ValueError):
+		random2.findMaxCapacityMatrix(4, links, [0], workers=1)
+
+def test_saveLinks_fromFile_round_trip(tmp_path, monkeypatch):
+	rng = random.Random(3)
+	n = 12
+	links = [(rng.randrange(n), rng.randrange(n), rng.randint(-5, 2**62)) for i in range(30)]
+	links.append((n - 1, 0, 2**63 - 1)) #largest capacity the file can hold
+	filename = str(tmp_path / "links.bin")
+	random2.saveLinks(filename, links)
+	expected = layout(random2.Graph.fromLinks(n, links))
+	assert layout(random2.Graph.fromFile(filename)) == expected
+	monkeypatch.setattr(random2, "np", None)
+	assert layout(random2.Graph.fromFile(filename)) == expected
+	assert layout(random2.Graph.fromFile(filename, n + 3))[1][-1] == 2*len(links)
+	with pytest.raises(ValueError):
+		random2.saveLinks(filename, [(0, 1, 2**63)])
+	empty = str(tmp_path / "empty.bin")
+	random2.saveLinks(empty, [])
+	assert layout(random2.Graph.fromFile(empty, 4)) == layout(random2.Graph.fromLinks(4, []))
+
+def test_early_exit_matches_full_sweep():
+	rng = random.Random(4)
+	for case in range(100):
+		n = rng.randint(1, 12)
+		links = [(rng.randrange(n), rng.randrange(n), rng.randint(1, 9)) for i in range(rng.randint(0, 2*n))]
+		for s in range(n):
+			maxcapacity, parent = random2.findMaxCapacities(n, links, s)
+			for t in range(n):
+				cap, route = random2.findMaxCapacity(n, links, s, t)
+				assert cap == maxcapacity[t]
+				if cap == -1:
+					assert route == [t]
+				elif s != t:
+					assert route[0] == s and route[-1] == t and widest(links, route) == cap
+					back = [t]
+					while parent[back[-1]] != -1:
+						back.append(parent[back[-1]])
+					assert back[-1] == s and widest(links, back[::-1]) == cap
+
+def test_matrix_matches_findMaxCapacity():
+	rng = random.Random(5)
+	n = 15
+	links = [(rng.randrange(n), rng.randrange(n), rng.randint(1, 20)) for i in range(25)]
+	sources = [3, 0, 3, 7, 14, 0] #duplicates get the same row
+	expected = {s: [random2.findMaxCapacity(n, links, s, t)[0] for t in range(n)] for s in sources}
+	rows = random2.findMaxCapacityMatrix(n, links, sources, workers=2)
+	assert [list(row) for row in rows] == [expected[s] for s in sources]
+	streamed = {}
+	for s, row in random2.findMaxCapacityMatrix(n, random2.Graph.fromLinks(n, links), sources, workers=2, stream=True):
+		assert s not in streamed #every distinct source is swept once
+		streamed[s] = list(row)
+	assert streamed == expected